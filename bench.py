@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from PIL import Image
+import constants
+import engine
+import gridsearch
+import main
+import mapformat
+import spritesheeter
+
+OUTPUT_PATH = '.cache/bench.json'
+BASELINE_PATH = '.cache/bench_baseline.json'
+SEED = 1
+
+BENCHMARKS = [] # (name, setup) pairs; setup() returns the callable to time
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+def map_names():
+    return sorted(name for name in os.listdir('maps') if name.endswith(mapformat.EXTENSIONS))
+
+def spawnpoint_count(board):
+    return sum(row.count(constants.SPAWNPOINT) for row in board)
+
+def open_board(n, spawnpoints=((0,0),)):
+    board = [[constants.AIR]*n for _ in range(n)]
+    for x,y in spawnpoints:
+        board[y][x] = constants.SPAWNPOINT
+    return board
+
+
+def bench_evaluate(map_name):
+    def setup():
+        board = engine.load_map('maps/' + map_name)
+        game = engine.Engine(board, 0, min(spawnpoint_count(board), 8), seed=SEED)
+        game.run(200) # get some bombs and pickups onto the board
+        bots = [bot for bot in game.bots if not bot.dead]
+        for bot in bots:
+            bot.func_drop_bomb = lambda: None
+
+        def run():
+            # always plan from scratch, the path following branch costs next to nothing
+            for bot in bots:
+                bot.target = None
+                bot.target_path = []
+                bot.evaluate(game.board, game.danger.rows, game.occupancy, game.tick)
+        return run
+    return setup
+
+def bench_explosion(radius):
+    def setup():
+        game = engine.Engine(open_board(41, ((0,0), (40,40))), 0, 2, seed=SEED)
+
+        def run():
+            bomb = engine.BombProperties(20, 20, radius)
+            game.bombs.add(bomb)
+            game.bomb_grid[20][20] = bomb
+            game.explode_bomb(bomb)
+        return run
+    return setup
+
+def bench_load(map_name):
+    def setup():
+        def run():
+            board = engine.load_map('maps/' + map_name)
+            engine.Engine(board, 0, min(spawnpoint_count(board), 8), seed=SEED)
+        return run
+    return setup
+
+def bench_replan(incremental, n=128):
+    def setup():
+        rng = random.Random(SEED)
+        blocked = [[rng.random() < 0.2 for _ in range(n)] for _ in range(n)]
+        blocked[0][0] = blocked[n-1][n-1] = False
+        passable = lambda x, y: not blocked[y][x]
+        repair = gridsearch.PathRepair(n, n)
+        search = gridsearch.GridSearch(n, n)
+        x,y = repair.path(0, 0, n-1, n-1, passable)[n]
+
+        def run():
+            # a tile on the path closes and opens again, the path is found again after each
+            for value in (True, False):
+                blocked[y][x] = value
+                if incremental:
+                    repair.note_changes(((x,y),))
+                    repair.path(0, 0, n-1, n-1, passable)
+                else:
+                    search.bfs(0, 0, passable, lambda tx, ty: True if tx == n-1 and ty == n-1 else None)
+        return run
+    return setup
+
+for _name in map_names():
+    benchmark(f'evaluate/{_name}')(bench_evaluate(_name))
+benchmark('replan/bfs')(bench_replan(False))
+benchmark('replan/repair')(bench_replan(True))
+for _radius in (3, 6, 10, 20):
+    benchmark(f'explode/r{_radius}')(bench_explosion(_radius))
+for _name in map_names():
+    benchmark(f'load/{_name}')(bench_load(_name))
+
+@benchmark('spritesheet/player')
+def bench_spritesheet():
+    return lambda: spritesheeter.split('assets/player.png')
+
+@benchmark('spritesheet/bomb')
+def bench_spritesheet_bomb():
+    return lambda: spritesheeter.split('assets/bomb.png', 50, 20)
+
+@benchmark('tint_image')
+def bench_tint():
+    frame = spritesheeter.split('assets/player.png')[0][0]
+    return lambda: main.tint_image(frame, constants.RED)
+
+@benchmark('gif_frames')
+def bench_gif():
+    return lambda: main.gif_frames('assets/shield_equipped.gif', 65, 65)
+
+@benchmark('scaler_images')
+def bench_scalers():
+    return lambda: main.scaler_images(Image.open('assets/speed.png'), 40)
+
+@benchmark('match/a0.map')
+def bench_match():
+    def run():
+        board = engine.load_map('maps/a0.map')
+        engine.Engine(board, 0, 8, seed=SEED).run(3000)
+    return run
+
+
+def measure(func, repeat):
+    """Per call times in ms, each call repeated until a batch takes at least 0.2 s."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = sorted(t*1000/number for t in timer.repeat(repeat, number))
+    return {'number': number, 'min_ms': times[0], 'median_ms': times[len(times)//2]}
+
+def run_benchmarks(pattern=None, repeat=5, func_progress=lambda name, result: None):
+    results = {}
+    for name,setup in BENCHMARKS:
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure(setup(), repeat)
+        func_progress(name, results[name])
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+def compare(results, baseline, threshold):
+    """(name, baseline ms, current ms, ratio, regressed) for every benchmark in both runs."""
+    rows = []
+    for name,current in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['min_ms']
+        ratio = current['min_ms'] / before if before else 1
+        rows.append((name, before, current['min_ms'], ratio, ratio > 1 + threshold))
+    return rows
+
+def write(filepath, results):
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    with open(filepath, 'w') as f:
+        json.dump(results, f, indent=1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the hot paths of the game on fixed maps and seeds.')
+    parser.add_argument('-k', dest='pattern', help='only run benchmarks whose name contains this')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-o', '--output', default=OUTPUT_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help=f'also save the results as {BASELINE_PATH}')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help='compare against a baseline file and fail on regressions')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown before failing, 0.25 is 25%%')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.pattern, args.repeat,
+                             lambda name, result: print(f'{name:<24} {result["min_ms"]:10.4f} ms  (median {result["median_ms"]:.4f})'))
+    write(args.output, results)
+    if args.save_baseline:
+        write(BASELINE_PATH, results)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        print()
+        for name,before,after,ratio,regressed in rows:
+            print(f'{name:<24} {before:10.4f} -> {after:10.4f} ms  {ratio:5.2f}x{"  SLOWER" if regressed else ""}')
+        if any(row[4] for row in rows):
+            sys.exit(1)
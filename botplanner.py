@@ -0,0 +1,138 @@
+import threading
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import BrokenExecutor
+import botscheduler
+import danger
+import engine
+
+# immutable copies of what Bot.evaluate reads, cheap to hand to another thread or process
+BombView = namedtuple('BombView', 'x y radius explodes_at')
+BotView = namedtuple('BotView', 'color pixel_x pixel_y blocksize pixel_speed speed bomb_radius bomb_fuse bomb_ready moving target target_path')
+Snapshot = namedtuple('Snapshot', 'tick board bombs players') # players: (color, pixel_x, pixel_y) of the living
+Decision = namedtuple('Decision', 'tick color moving drop_bomb target target_path') # tick of the snapshot it was made on
+
+_local = threading.local() # searches and occupancy reused by each worker between plans
+
+
+def snapshot(game:engine.Engine):
+    return Snapshot(game.tick,
+                    tuple(map(tuple, game.board)),
+                    tuple(BombView(bomb.x, bomb.y, bomb.radius, bomb.explodes_at) for bomb in game.bombs),
+                    tuple((player.color, player.pixel_x, player.pixel_y) for player in game.players if not player.dead))
+
+def bot_view(game:engine.Engine, bot:engine.Bot):
+    return BotView(bot.color, bot.pixel_x, bot.pixel_y, bot.blocksize, game.speed_to_pixels_per_second(bot.speed),
+                   bot.speed, bot.bomb_radius, bot.bomb_fuse, bot.bomb_ready, bot.moving, bot.target, tuple(bot.target_path))
+
+def plan(snap:Snapshot, view:BotView):
+    """Runs Bot.evaluate for one bot on a snapshot, in whichever thread or process it is called."""
+    h,w = len(snap.board), len(snap.board[0])
+    drops = []
+    bot = engine.Bot(view.color, view.pixel_x, view.pixel_y, view.blocksize, lambda speed: view.pixel_speed, lambda: drops.append(True))
+    bot.speed = view.speed
+    bot.bomb_radius = view.bomb_radius
+    bot.bomb_fuse = view.bomb_fuse
+    bot.bomb_ready = view.bomb_ready
+    bot.moving = view.moving
+    bot.target = view.target
+    bot.target_path = list(view.target_path)
+
+    searches = getattr(_local, 'searches', None)
+    if searches is None or searches[0] != (w,h):
+        _local.searches = searches = ((w,h), dict(), engine.Occupancy(w, h), danger.DangerMap(w, h))
+    _, bot_searches, occupancy, danger_map = searches
+    bot.target_search, bot.safety_search, bot.path_repair = bot_searches.get(view.color, (None, None, None))
+    if bot.path_repair:
+        bot.path_repair.forget() # it has not heard of the changes since this bot's last plan
+
+    for player in list(occupancy.tile_of):
+        occupancy.remove(player)
+    for color,pixel_x,pixel_y in snap.players:
+        occupancy.add(bot if color == view.color else engine.Player(color, pixel_x, pixel_y, view.blocksize))
+
+    bot.evaluate(snap.board, danger_map.update(snap.board, snap.bombs), occupancy, snap.tick)
+    bot_searches[view.color] = (bot.target_search, bot.safety_search, bot.path_repair)
+    return Decision(snap.tick, view.color, bot.moving, bool(drops), bot.target, bot.target_path)
+
+
+class BotPlanner:
+    """
+    Runs the bots' decisions on an executor instead of inside Engine.step.
+    Every tick each bot without a plan in flight gets one submitted on a
+    snapshot of the match; finished plans are applied at the start of a
+    later tick through the engine's input methods, so they are recorded
+    like human inputs. Nothing ever waits on the executor: a bot whose plan
+    is still running keeps doing what it did.
+
+    A plan that raises is dropped and the bot keeps its last decision. If
+    the executor breaks, the planner hands the bots to fallback, a
+    botscheduler.BotScheduler, which evaluates them on the engine's thread;
+    their decisions stay recorded like human inputs.
+
+    Attach it as engine.bot_planner.
+    """
+
+    def __init__(self, executor, fallback=None, history=600):
+        self.executor = executor
+        self.fallback = fallback
+        self.futures = dict() # bot -> future of its Decision
+        self.ages = defaultdict(lambda: deque(maxlen=history)) # bot color -> ticks between snapshot and applying
+        self.applied = 0
+        self.failed = 0
+
+    def run(self, game:engine.Engine):
+        snap = None
+        try:
+            for bot in game.bots:
+                future = self.futures.get(bot)
+                if future is not None and future.done():
+                    del self.futures[bot]
+                    try:
+                        decision = future.result()
+                    except BrokenExecutor:
+                        raise
+                    except Exception:
+                        self.failed += 1
+                    else:
+                        if not bot.dead:
+                            self.apply(game, bot, decision)
+                if bot.dead or bot in self.futures:
+                    continue
+                if snap is None:
+                    snap = snapshot(game)
+                self.futures[bot] = self.executor.submit(plan, snap, bot_view(game, bot))
+        except BrokenExecutor:
+            self.fall_back(game)
+
+    def fall_back(self, game:engine.Engine):
+        self.cancel()
+        game.bot_planner = None
+        game.record_bot_inputs = True
+        game.bot_scheduler = self.fallback or botscheduler.BotScheduler()
+        game.bot_scheduler.run(game)
+
+    def apply(self, game:engine.Engine, bot:engine.Bot, decision:Decision):
+        self.ages[bot.color].append(game.tick - decision.tick)
+        self.applied += 1
+        bot.target = decision.target
+        bot.target_path = decision.target_path
+        game.input_move(bot, decision.moving)
+        if decision.drop_bomb:
+            game.input_bomb(bot)
+
+    def cancel(self):
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+    def age_stats(self, color):
+        ages = sorted(self.ages[color])
+        if not ages:
+            return {'decisions': 0, 'mean': 0, 'p95': 0, 'max': 0}
+        return {'decisions': len(ages), 'mean': sum(ages)/len(ages), 'p95': ages[min(len(ages)-1, int(len(ages)*0.95))], 'max': ages[-1]}
+
+    def report(self):
+        ages = ', '.join(f'{color}: mean {s["mean"]:.1f} p95 {s["p95"]} max {s["max"]}'
+                         for color,s in ((color, self.age_stats(color)) for color in sorted(self.ages)))
+        failed = f', {self.failed} failed' if self.failed else ''
+        return f'bots: {self.applied} planned decisions applied{failed}; age in ticks {ages}'
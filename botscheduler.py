@@ -0,0 +1,83 @@
+import time
+from collections import defaultdict, deque
+import danger
+
+
+class BotScheduler:
+    """
+    Spreads bot decisions over the ticks so they fit in budget_ms of real
+    time per frame, counted from the last begin_frame call, or per tick
+    without one. Bots standing on a tile a bomb is about to reach always
+    decide, soonest explosion first. The other bots decide when their
+    replan_every ticks are up, the one waiting longest first, for as long
+    as the budget lasts; the rest are deferred to the next tick. A bot that
+    does not decide keeps moving the way it last decided to.
+
+    Attach it as engine.bot_scheduler. Bots the budget deferred go through
+    Engine.input_skip_bot, so they are recorded; a recording plays back the
+    same with an unlimited budget and the recorded replan_every of each bot.
+    Bots already skipped this tick count as deferred.
+    """
+
+    def __init__(self, budget_ms=6, history=600, clock=time.perf_counter):
+        self.budget_ms = budget_ms
+        self.clock = clock
+        self.last_run = dict() # bot -> tick it last decided
+        self.delays = defaultdict(lambda: deque(maxlen=history)) # bot color -> ticks a decision came late
+        self.deferred = deque(maxlen=history) # bots deferred per tick
+        self.deferred_total = 0
+        self.frame_start = None
+
+    def begin_frame(self):
+        """Starts the budget over; call it once per frame before the frame's ticks."""
+        self.frame_start = self.clock()
+
+    def run(self, game):
+        tick = game.tick
+        rows = game.danger.rows
+        urgent, due, idle = [], [], []
+        for bot in game.bots:
+            if bot.dead:
+                continue
+            if rows[bot.y][bot.x] != danger.NEVER:
+                urgent.append(bot)
+            elif tick - self.last_run.get(bot, tick - bot.replan_every) >= bot.replan_every:
+                due.append(bot)
+            else:
+                idle.append(bot)
+        urgent.sort(key=lambda bot: rows[bot.y][bot.x])
+        due.sort(key=lambda bot: self.last_run.get(bot, -1))
+
+        start = self.clock() if self.frame_start is None else self.frame_start
+        for bot in urgent:
+            self.decide(game, bot, tick)
+        deferred = 0
+        for bot in due:
+            # the first due bot of each tick always decides, so a bot slower than the budget still gets its turns
+            if bot in game.skipped_bots:
+                deferred += 1
+            elif deferred or (bot is not due[0] and (self.clock() - start)*1000 >= self.budget_ms):
+                deferred += 1
+                game.input_skip_bot(bot)
+            else:
+                self.decide(game, bot, tick)
+
+        self.deferred.append(deferred)
+        self.deferred_total += deferred
+
+    def decide(self, game, bot, tick):
+        due_at = self.last_run.get(bot, tick - bot.replan_every) + bot.replan_every
+        self.delays[bot.color].append(max(tick - due_at, 0))
+        self.last_run[bot] = tick
+        game.evaluate_bot(bot)
+
+    def delay_stats(self, color):
+        delays = sorted(self.delays[color])
+        if not delays:
+            return {'decisions': 0, 'mean': 0, 'max': 0}
+        return {'decisions': len(delays), 'mean': sum(delays)/len(delays), 'max': delays[-1]}
+
+    def report(self):
+        delays = ', '.join(f'{color}: mean {s["mean"]:.2f} max {s["max"]}'
+                           for color,s in ((color, self.delay_stats(color)) for color in sorted(self.delays)))
+        return f'bots: {self.deferred_total} decisions deferred, {max(self.deferred, default=0)} at most in a tick; delay in ticks {delays}'
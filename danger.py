@@ -0,0 +1,78 @@
+import sys
+import constants
+
+NEVER = sys.maxsize # danger value of tiles no bomb reaches
+
+DIRECTIONS = ((0,-1), (0,1), (-1,0), (1,0))
+
+
+def blast_tiles(board, x, y, radius):
+    """
+    Tiles reached by a single bomb. The blast travels radius-1 tiles in each
+    direction, stops before walls and stops on (and includes) the first barrel.
+    """
+    h,w = len(board), len(board[0])
+    tiles = [(x,y)]
+    for dx,dy in DIRECTIONS:
+        for i in range(1, radius):
+            nx,ny = x+dx*i, y+dy*i
+            if nx < 0 or nx >= w or ny < 0 or ny >= h or board[ny][nx] == constants.WALL:
+                break
+            tiles.append((nx,ny))
+            if board[ny][nx] == constants.BARREL:
+                break
+    return tiles
+
+def chain_reaction_times(blasts):
+    """
+    Tick each bomb really goes off at, given (bomb, blast tiles) pairs: a
+    bomb reached by an earlier blast goes off with it. Only bombs set off
+    early are in the returned dict.
+    """
+    at_tile = {(bomb.x, bomb.y): bomb for bomb,_ in blasts}
+    times = {bomb: bomb.explodes_at for bomb,_ in blasts}
+    changed = True
+    while changed:
+        changed = False
+        for bomb,tiles in blasts:
+            for tile in tiles:
+                other = at_tile.get(tile)
+                if other is not None and times[bomb] < times[other]:
+                    times[other] = times[bomb]
+                    changed = True
+    return {bomb: t for bomb,t in times.items() if t != bomb.explodes_at}
+
+
+class DangerMap:
+    """
+    Earliest tick at which an explosion reaches each tile, counting bombs
+    set off by other bombs' blasts, NEVER where no bomb reaches, kept as
+    plain lists between steps. update() only rewrites the tiles the bombs
+    reached last time and reach now, so its cost follows the number of
+    bombs instead of the size of the map. flipped holds the tiles that
+    became or stopped being dangerous in the last update().
+    """
+
+    def __init__(self, w, h):
+        self.rows = [[NEVER]*w for _ in range(h)]
+        self.marked = []
+        self.flipped = []
+
+    def update(self, board, bombs):
+        rows = self.rows
+        old = self.marked
+        for x,y in old:
+            rows[y][x] = NEVER
+        self.marked = []
+        blasts = [(bomb, blast_tiles(board, bomb.x, bomb.y, bomb.radius)) for bomb in bombs]
+        chain_times = chain_reaction_times(blasts)
+        for bomb,tiles in blasts:
+            explodes_at = chain_times.get(bomb, bomb.explodes_at)
+            for x,y in tiles:
+                if rows[y][x] == NEVER:
+                    self.marked.append((x,y))
+                    rows[y][x] = explodes_at
+                elif explodes_at < rows[y][x]:
+                    rows[y][x] = explodes_at
+        self.flipped = list(set(old).symmetric_difference(self.marked)) if old or self.marked else []
+        return rows
@@ -0,0 +1,663 @@
+import hashlib
+import random
+from collections import deque
+import constants
+import danger
+import gridsearch
+import mapformat
+import scheduler
+
+TICK_MS = 16 # length of one simulation step in ms
+BOMB_INPUT = 255 # input code of a bomb drop, movement inputs are Player.moving codes
+SKIP_INPUT = 254 # input code of a bot the bot scheduler's budget left out of a tick
+
+
+def load_map(filepath):
+    return mapformat.read_board(filepath).tolist()
+
+def randchoice(items, probabilities, rng=random):
+    s = 0
+    c = rng.random()
+    for i in range(len(items)):
+        s += probabilities[i]
+        if s >= c:
+            return items[i]
+
+def ms_to_ticks(ms):
+    return max(1, round(ms / TICK_MS))
+
+def _trinket_probabilities():
+    tp = [0]*9
+    tp[constants.SPEED_BUFF-4] =  10
+    tp[constants.SPEED_DEBUFF-4] = 10
+    tp[constants.FUSE_BUFF-4] = 8
+    tp[constants.FUSE_DEBUFF-4] = 8
+    tp[constants.COOLDOWN_BUFF-4] = 6
+    tp[constants.COOLDOWN_DEBUFF-4] = 6
+    tp[constants.RADIUS_BUFF-4] = 4
+    tp[constants.RADIUS_DEBUFF-4] = 4
+    tp[constants.SHIELD-4] = 5
+    s = sum(tp)
+    return [p/s for p in tp]
+
+TRINKET_PROBABILITIES = _trinket_probabilities()
+TRINKETS = list(range(constants.SPEED_BUFF, constants.SHIELD+1))
+BUFFS = frozenset((constants.SPEED_BUFF, constants.RADIUS_BUFF, constants.FUSE_BUFF, constants.COOLDOWN_BUFF, constants.SHIELD))
+SOLID = frozenset((constants.WALL, constants.BARREL))
+
+
+class BombProperties:
+    def __init__(self, x, y, radius, explodes_at=0, dropped_at=0):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.explodes_at = explodes_at
+        self.dropped_at = dropped_at
+        self.event = None
+
+    def fuse_burnt(self, tick):
+        """Fraction of the fuse that has burnt down at tick, 0 to 1."""
+        return min(max((tick - self.dropped_at) / max(self.explodes_at - self.dropped_at, 1), 0), 1)
+
+
+class Player:
+    def __init__(self, color, pixel_x, pixel_y, blocksize):
+        self.color = color
+        self.pixel_x = pixel_x
+        self.pixel_y = pixel_y
+        self.blocksize = blocksize
+        self.moving = 0
+        self.dead = False
+        self.tick_of_last_bomb = None
+        self.bomb_ready = True
+        self.cooldown_event = None
+
+        self.speed = 1
+        self.bomb_cooldown = 2 # seconds
+        self.bomb_fuse = 1500 # ms
+        self.bomb_radius = 3 # tiles
+        self.shielded = False
+
+    def move(self, code):
+        self.moving = code
+
+    def start_moving(self, direction):
+        self.move(self.moving | (1<<direction))
+
+    def stop_moving(self, direction):
+        self.move(self.moving ^ ((1<<direction)&self.moving))
+
+    def can_drop_bomb(self):
+        return self.bomb_ready
+
+    x = property(lambda self: int(self.pixel_x//self.blocksize))
+    y = property(lambda self: int(self.pixel_y//self.blocksize))
+
+
+class Board(list):
+    """
+    Rows of blocks, read as board[y][x] like the plain lists it holds, with
+    a journal of writes. Every write goes through set(), fill() or assign()
+    so that only real changes bump version, go into the dirty set and reach
+    the subscribers, func(x, y) for each changed cell.
+    """
+
+    def __init__(self, rows):
+        super().__init__(list(row) for row in rows)
+        self.h, self.w = len(self), len(self[0])
+        self.version = 0
+        self.dirty = set() # cells changed since the last advance()
+        self.subscribers = []
+
+    def subscribe(self, func):
+        self.subscribers.append(func)
+        return func
+
+    def unsubscribe(self, func):
+        self.subscribers.remove(func)
+
+    def set(self, x, y, block):
+        row = self[y]
+        if row[x] == block:
+            return False
+        row[x] = block
+        self.version += 1
+        self.dirty.add((x,y))
+        for func in self.subscribers:
+            func(x, y)
+        return True
+
+    def fill(self, block):
+        for y in range(self.h):
+            for x in range(self.w):
+                self.set(x, y, block)
+
+    def assign(self, rows):
+        """Copies rows of the same size in, cell by cell, so only the cells that differ change."""
+        if len(rows) != self.h or any(len(row) != self.w for row in rows):
+            raise ValueError(f'board is {self.w}x{self.h}, got {len(rows[0]) if rows else 0}x{len(rows)}')
+        for y,row in enumerate(rows):
+            for x,block in enumerate(row):
+                self.set(x, y, block)
+
+    def advance(self):
+        """Starts a new tick of the journal, returns the cells changed during the last one."""
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
+
+
+class Occupancy:
+    """
+    Living players by tile, with a count per row and column. Only players
+    that changed tiles since the last update() cost anything.
+    """
+
+    def __init__(self, w, h):
+        self.tiles:list[list[list[Player]]] = [[[] for _ in range(w)] for _ in range(h)]
+        self.rows = [0]*h
+        self.columns = [0]*w
+        self.tile_of = dict() # player -> (x, y)
+
+    def add(self, player:Player):
+        x,y = player.x, player.y
+        self.tiles[y][x].append(player)
+        self.rows[y] += 1
+        self.columns[x] += 1
+        self.tile_of[player] = (x,y)
+
+    def remove(self, player:Player):
+        x,y = self.tile_of.pop(player)
+        self.tiles[y][x].remove(player)
+        self.rows[y] -= 1
+        self.columns[x] -= 1
+
+    def update(self, player:Player):
+        if self.tile_of.get(player) != (player.x, player.y):
+            self.remove(player)
+            self.add(player)
+
+    def at(self, x, y):
+        return self.tiles[y][x]
+
+    def others_in_line(self, player:Player, x, y, reach):
+        """Whether anyone but player stands on row y or column x less than reach tiles from (x, y)."""
+        px,py = self.tile_of.get(player, (-1,-1))
+        if self.rows[y] - (py == y) > 0:
+            row = self.tiles[y]
+            for i in range(max(x-reach+1, 0), min(x+reach, len(row))):
+                if any(other is not player for other in row[i]):
+                    return True
+        if self.columns[x] - (px == x) > 0:
+            for j in range(max(y-reach+1, 0), min(y+reach, len(self.tiles))):
+                if any(other is not player for other in self.tiles[j][x]):
+                    return True
+        return False
+
+
+class Bot(Player):
+    TARGET_PLAYER = 0
+    TARGET_BARREL = 1
+    TARGET_BUFF = 2
+
+    def __init__(self, color, pixel_x, pixel_y, blocksize, func_speed_to_pixels_per_second, func_drop_bomb):
+        super().__init__(color, pixel_x, pixel_y, blocksize)
+        self.func_speed_to_pixels_per_second = func_speed_to_pixels_per_second
+        self.func_drop_bomb = func_drop_bomb
+        self.target = None
+        self.target_path = []
+        self.target_search = None
+        self.safety_search = None # separate from target_search, safety checks run inside target searches
+        self.path_repair = None # gridsearch.PathRepair towards the current target
+        self.replan_every = 1 # ticks between decisions when a BotScheduler runs the bots
+
+    def evaluate(self, board, danger_rows, occupancy:Occupancy, tick):
+        def is_forbidden(x, y, extra_forbidden=()):
+            return danger_rows[y][x] != danger.NEVER or (x,y) in extra_forbidden
+
+        def is_open(x, y):
+            return board[y][x] not in SOLID
+
+        def closest_path_to_safety(x, y, extra_forbidden=()):
+            path, _ = self.safety_search.bfs(x, y, is_open, lambda x, y: None if is_forbidden(x, y, extra_forbidden) else True)
+            return path
+
+        def enemy_in_range(x, y):
+            return occupancy.others_in_line(self, x, y, self.bomb_radius)
+
+        def can_safely_detonate(x, y):
+            my_blast = set(danger.blast_tiles(board, x, y, self.bomb_radius))
+            path_to_safety = closest_path_to_safety(x, y, my_blast)
+            blocks = len(path_to_safety)-1
+            if blocks == -1:
+                return False
+            pixel_distance = blocks*self.blocksize
+            return pixel_distance/pixel_speed < self.bomb_fuse/1000
+
+        def target_at(x, y):
+            if board[y][x] in BUFFS:
+                return self.TARGET_BUFF
+
+            if enemy_in_range(x, y):
+                return self.TARGET_PLAYER
+
+            for _, nx, ny in neighbours[y*w+x]:
+                if board[ny][nx] == constants.BARREL and danger_rows[ny][nx] == danger.NEVER:
+                    if can_safely_detonate(x, y):
+                        return self.TARGET_BARREL
+                    break
+
+        def is_walkable(x, y):
+            return board[y][x] not in SOLID and danger_rows[y][x] == danger.NEVER
+
+        def find_target(x, y):
+            path, target = self.target_search.bfs(x, y, is_walkable, target_at)
+            if target is not None:
+                self.target = target
+                self.target_path = path
+                self.path_repair.forget()
+
+        def repair_path(x, y):
+            # the target may still be there with only the way to it blocked; a safety path has no target to keep
+            if self.target is None:
+                return False
+            gx,gy = self.target_path[-1]
+            if is_forbidden(x, y) or not is_walkable(gx, gy) or target_at(gx, gy) != self.target:
+                return False
+            self.target_path = self.path_repair.path(x, y, gx, gy, is_walkable)
+            return bool(self.target_path)
+
+        def follow_path(path):
+            dx,dy = path[0][0] - x, path[0][1] - y
+            code = 0
+
+            if dx <= -1:
+                code |= constants.MOVING_LEFT
+            elif dx >= 1:
+                code |= constants.MOVING_RIGHT
+
+            if dy <= -1:
+                code |= constants.MOVING_UP
+            elif dy >= 1:
+                code |= constants.MOVING_DOWN
+
+            self.move(code)
+
+
+        x,y = self.x, self.y
+        h,w = len(board), len(board[0])
+        if self.target_search is None or self.target_search.w != w or self.target_search.h != h:
+            self.target_search = gridsearch.GridSearch(w, h)
+            self.safety_search = gridsearch.GridSearch(w, h)
+            self.path_repair = gridsearch.PathRepair(w, h)
+        pixel_speed = self.func_speed_to_pixels_per_second(self.speed)
+        neighbours = self.target_search.neighbours
+
+        for pos in self.target_path:
+            if is_forbidden(*pos):
+                if not repair_path(x, y):
+                    self.target = None
+                    self.target_path = []
+                break
+
+        if is_forbidden(x, y):
+            self.target = None
+            self.target_path = closest_path_to_safety(x, y)[1:]
+            if len(self.target_path) == 0:
+                self.move(0)
+                return
+
+            follow_path(self.target_path)
+
+        elif self.can_drop_bomb() and enemy_in_range(x, y) and can_safely_detonate(x, y):
+            self.func_drop_bomb()
+        elif self.target == None:
+            find_target(x, y)
+            if not self.target:
+                self.move(0)
+        else:
+            if len(self.target_path) == 0:
+                if self.target == self.TARGET_BARREL and can_safely_detonate(x, y):
+                    self.func_drop_bomb()
+                self.target = None
+                return self.evaluate(board, danger_rows, occupancy, tick)
+            else:
+                if x == self.target_path[0][0] and y == self.target_path[0][1]:
+                    self.target_path.pop(0)
+                else:
+                    follow_path(self.target_path)
+
+    def note_changes(self, tiles):
+        """Tiles whose block or danger changed since the last tick, for repairing the path."""
+        if self.path_repair:
+            self.path_repair.note_changes(tiles)
+
+
+class Engine:
+    """
+    Match rules without any Tk in them. The board, players, bombs and pickups
+    live here and the match advances one TICK_MS step per call to step().
+    Renderers hook in through the func_on_* callbacks.
+    """
+
+    def __init__(self, board, n_humans, n_bots, blocksize=40, seed=None, pickup_respawn_ms=None,
+                 func_on_bomb_dropped=None, func_on_explosion=None, func_on_block_changed=None):
+        self.seed = seed if seed is not None else random.getrandbits(32) # kept so the match can be replayed
+        self.random = random.Random(self.seed)
+        self.n_humans = n_humans
+        self.n_bots = n_bots
+        self.scheduler = scheduler.EventScheduler()
+        self.paused = False
+        self.pickup_respawn_ms = pickup_respawn_ms # collected pickups come back after this long, never if None
+        self.board = Board(board)
+        self.h, self.w = self.board.h, self.board.w
+        self.blocksize = blocksize
+        self.tick = 0
+        self.players:list[Player] = []
+        self.bots:list[Bot] = []
+        self.bombs:set[BombProperties] = set()
+        self.bomb_grid:list[list[BombProperties]] = [[None]*self.w for _ in range(self.h)] # live bomb on each tile
+        self.danger = danger.DangerMap(self.w, self.h)
+        self.occupancy = Occupancy(self.w, self.h)
+        self.profiler = None # a profiler.Profiler while step() should be timed
+        self.recorder = None # a replay.Recorder while the match is recorded
+        self.bot_scheduler = None # a botscheduler.BotScheduler, every bot decides every tick if None
+        self.bot_planner = None # a botplanner.BotPlanner while the bots decide off the engine's thread
+        self.skipped_bots = set()
+        self.record_bot_inputs = False # record the bots' decisions like human inputs, once a bot planner has run them
+        self.finished = False
+        self.winner = None
+        self.bombs_dropped = 0
+        self.func_on_bomb_dropped = func_on_bomb_dropped
+        self.func_on_explosion = func_on_explosion
+
+        spawnpoints = []
+        for y in range(self.h):
+            for x in range(self.w):
+                if self.board[y][x] == constants.SPAWNPOINT:
+                    spawnpoints.append((x,y))
+                    self.board.set(x, y, constants.AIR)
+
+        if n_humans + n_bots > len(spawnpoints):
+            raise ValueError(f'Map has {len(spawnpoints)} spawnpoints, {n_humans+n_bots} players requested')
+
+        self.random.shuffle(spawnpoints)
+        self.spawnpoints = spawnpoints
+
+        for i in range(n_humans):
+            x,y = spawnpoints[i]
+            self.players.append(Player(i, *self.tile_center(x, y), blocksize))
+
+        for j in range(n_bots):
+            x,y = spawnpoints[j+n_humans]
+            bot = Bot(j+n_humans, *self.tile_center(x, y), blocksize, self.speed_to_pixels_per_second, None)
+            bot.func_drop_bomb = lambda b=bot: self.drop_bomb(b)
+            self.players.append(bot)
+            self.bots.append(bot)
+
+        for player in self.players:
+            self.occupancy.add(player)
+        if func_on_block_changed:
+            self.board.subscribe(func_on_block_changed)
+
+    def tile_center(self, x, y):
+        return x*self.blocksize+self.blocksize//2, y*self.blocksize+self.blocksize//2
+
+    def speed_to_pixels_per_second(self, speed):
+        return self.blocksize/15*speed*60
+
+    def set_block(self, x, y, block):
+        self.board.set(x, y, block)
+
+    def drop_bomb(self, player:Player):
+        if self.finished or self.paused or player.dead or not player.can_drop_bomb():
+            return
+
+        x,y = player.x, player.y
+        if self.bomb_grid[y][x]:
+            return
+
+        bomb = BombProperties(x, y, player.bomb_radius, self.tick + ms_to_ticks(player.bomb_fuse), self.tick)
+        bomb.event = self.scheduler.schedule(bomb.explodes_at, self.explode_bomb, bomb)
+        player.tick_of_last_bomb = self.tick
+        player.bomb_ready = False
+        self.schedule_cooldown(player)
+        self.bombs.add(bomb)
+        self.bomb_grid[y][x] = bomb
+        self.bombs_dropped += 1
+        if self.func_on_bomb_dropped:
+            self.func_on_bomb_dropped(bomb, player)
+
+    def input_move(self, player:Player, code):
+        """Movement input of a human player or a planned bot, code is the new Player.moving."""
+        if code == player.moving:
+            return
+        if self.recorder:
+            self.recorder.record_input(self.tick, player.color, code)
+        player.move(code)
+
+    def input_bomb(self, player:Player):
+        if self.recorder:
+            self.recorder.record_input(self.tick, player.color, BOMB_INPUT)
+        self.drop_bomb(player)
+
+    def input_skip_bot(self, bot:Bot):
+        """Leaves bot out of this tick's decisions, it keeps doing what it did."""
+        if self.recorder:
+            self.recorder.record_input(self.tick, bot.color, SKIP_INPUT)
+        self.skipped_bots.add(bot)
+
+    def evaluate_bot(self, bot:Bot):
+        moving, dropped = bot.moving, self.bombs_dropped
+        bot.evaluate(self.board, self.danger.rows, self.occupancy, self.tick)
+        if self.record_bot_inputs and self.recorder:
+            if bot.moving != moving:
+                self.recorder.record_input(self.tick, bot.color, bot.moving)
+            if self.bombs_dropped != dropped:
+                self.recorder.record_input(self.tick, bot.color, BOMB_INPUT)
+        if self.profiler:
+            self.profiler.lap(f'bot {bot.color}')
+
+    def explode_bomb(self, bomb:BombProperties):
+        """
+        Detonates bomb and, breadth first, every bomb its flames reach. All
+        blasts of the chain are traced on the board as it was before the
+        chain went off and every tile is burnt once.
+        """
+        queue = deque([bomb])
+        self.detach_bomb(bomb)
+        burnt = dict() # tile -> None, ordered by when the flames first reached it
+        blasts = []
+        while queue:
+            bomb = queue.popleft()
+            tiles = danger.blast_tiles(self.board, bomb.x, bomb.y, bomb.radius)
+            blasts.append((bomb, tiles))
+            for x,y in tiles:
+                if (x,y) in burnt:
+                    continue
+                burnt[x,y] = None
+                other = self.bomb_grid[y][x]
+                if other:
+                    self.scheduler.cancel(other.event)
+                    self.detach_bomb(other)
+                    queue.append(other)
+
+        for x,y in burnt:
+            if self.board[y][x] == constants.BARREL:
+                if self.random.random() < 0.5:
+                    self.set_block(x, y, randchoice(TRINKETS, TRINKET_PROBABILITIES, self.random))
+                else:
+                    self.set_block(x, y, constants.AIR)
+
+        for x,y in burnt:
+            for player in self.occupancy.at(x, y)[:]:
+                self.hit(player)
+
+        if self.func_on_explosion:
+            for bomb,tiles in blasts:
+                self.func_on_explosion(bomb, tiles)
+
+    def detach_bomb(self, bomb:BombProperties):
+        self.bombs.discard(bomb)
+        self.bomb_grid[bomb.y][bomb.x] = None
+
+    def schedule_cooldown(self, player:Player):
+        # events run at the end of a step, so this is ready from the first tick
+        # more than bomb_cooldown seconds after the drop
+        if player.cooldown_event:
+            self.scheduler.cancel(player.cooldown_event)
+        due = max(player.tick_of_last_bomb + int(player.bomb_cooldown*1000/TICK_MS), self.tick)
+        player.cooldown_event = self.scheduler.schedule(due, self.cooldown_over, player)
+
+    def recheck_cooldown(self, player:Player):
+        # a new cooldown counts from the last drop, it can lock a ready bomb again
+        if player.tick_of_last_bomb is not None:
+            player.bomb_ready = False
+            self.schedule_cooldown(player)
+
+    def cooldown_over(self, player:Player):
+        player.bomb_ready = True
+        player.cooldown_event = None
+
+    def respawn_pickup(self, x, y, block):
+        if self.board[y][x] == constants.AIR and not self.bomb_grid[y][x]:
+            self.set_block(x, y, block)
+        else:
+            self.scheduler.schedule(self.tick + ms_to_ticks(self.pickup_respawn_ms), self.respawn_pickup, x, y, block)
+
+    def hit(self, player:Player):
+        if player.shielded:
+            player.shielded = False
+        else:
+            player.dead = True
+            self.occupancy.remove(player)
+
+    def move_player(self, player:Player):
+        move = [0,0]
+        if player.moving & constants.MOVING_UP:
+            move[1] -= 1
+        if player.moving & constants.MOVING_DOWN:
+            move[1] += 1
+        if player.moving & constants.MOVING_LEFT:
+            move[0] -= 1
+        if player.moving & constants.MOVING_RIGHT:
+            move[0] += 1
+
+        value = (move[0]**2 + move[1]**2)**0.5
+
+        if value != 0:
+            SCALE = self.blocksize/15*player.speed
+            move = (move[0]/value*SCALE, move[1]/value*SCALE)
+            oldx,oldy = player.x, player.y
+
+            player.pixel_x += move[0]
+            player.pixel_y += move[1]
+
+            x,y = player.x, player.y
+            if x < 0 or x >= self.w or self.board[oldy][x] in [constants.WALL, constants.BARREL]:
+                player.pixel_x -= move[0]
+            if y < 0 or y >= self.h or self.board[y][oldx] in [constants.WALL, constants.BARREL]:
+                player.pixel_y -= move[1]
+
+    def collect_pickup(self, player:Player):
+        x,y = player.x, player.y
+
+        match self.board[y][x]:
+            case constants.SPEED_BUFF:
+                player.speed *= 1.2
+            case constants.SPEED_DEBUFF:
+                player.speed /= 1.2
+            case constants.RADIUS_BUFF:
+                player.bomb_radius += 1
+            case constants.RADIUS_DEBUFF:
+                player.bomb_radius = max(player.bomb_radius-1, 1)
+            case constants.FUSE_BUFF:
+                player.bomb_fuse /= 1.2
+            case constants.FUSE_DEBUFF:
+                player.bomb_fuse *= 1.2
+            case constants.COOLDOWN_BUFF:
+                player.bomb_cooldown /= 1.4
+                self.recheck_cooldown(player)
+            case constants.COOLDOWN_DEBUFF:
+                player.bomb_cooldown *= 1.4
+                self.recheck_cooldown(player)
+            case constants.SHIELD:
+                player.shielded = True
+
+        if constants.SHIELD >= self.board[y][x] >= constants.SPEED_BUFF:
+            if self.pickup_respawn_ms is not None:
+                self.scheduler.schedule(self.tick + ms_to_ticks(self.pickup_respawn_ms), self.respawn_pickup, x, y, self.board[y][x])
+            self.set_block(x, y, constants.AIR)
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def step(self):
+        if self.finished or self.paused:
+            return
+
+        profiler = self.profiler
+        if profiler:
+            profiler.lap()
+
+        self.danger.update(self.board, self.bombs)
+        changes = [*self.board.advance(), *self.danger.flipped]
+        if changes:
+            for bot in self.bots:
+                if not bot.dead:
+                    bot.note_changes(changes)
+        if profiler:
+            profiler.lap('danger')
+
+        if self.bot_planner:
+            self.bot_planner.run(self)
+        elif self.bot_scheduler:
+            self.bot_scheduler.run(self)
+        else:
+            for bot in self.bots:
+                if not bot.dead and bot not in self.skipped_bots:
+                    self.evaluate_bot(bot)
+        self.skipped_bots.clear()
+
+        for player in self.players:
+            if not player.dead:
+                self.move_player(player)
+                self.occupancy.update(player)
+        if profiler:
+            profiler.lap('movement')
+
+        for player in self.players:
+            if not player.dead:
+                self.collect_pickup(player)
+        if profiler:
+            profiler.lap('pickups')
+
+        self.scheduler.run_due(self.tick)
+        if profiler:
+            profiler.lap('explosions')
+
+        self.tick += 1
+
+        alive = [player for player in self.players if not player.dead]
+        if len(alive) < 2:
+            self.finished = True
+            self.winner = alive[0] if alive else None
+
+        if self.recorder:
+            self.recorder.after_step(self)
+
+    def state_hash(self):
+        """64 bit digest of everything that decides how the match goes on."""
+        players = [(p.pixel_x, p.pixel_y, p.moving, p.dead, p.shielded, p.bomb_ready,
+                    p.speed, p.bomb_cooldown, p.bomb_fuse, p.bomb_radius) for p in self.players]
+        bombs = sorted((bomb.x, bomb.y, bomb.radius, bomb.explodes_at) for bomb in self.bombs)
+        digest = hashlib.blake2b(repr((self.tick, self.board, players, bombs)).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    def run(self, max_ticks=None):
+        while not self.finished and (max_ticks is None or self.tick < max_ticks):
+            self.step()
+        return self.winner
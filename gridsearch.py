@@ -0,0 +1,214 @@
+import heapq
+from collections import deque
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8)
+def neighbour_table(w, h):
+    # neighbours in the order the bots always expanded them: down, up, right, left
+    table = []
+    for i in range(w*h):
+        x,y = i % w, i // w
+        table.append(tuple((ny*w+nx, nx, ny) for nx,ny in ((x,y+1), (x,y-1), (x+1,y), (x-1,y)) if w > nx >= 0 and h > ny >= 0))
+    return tuple(table)
+
+
+class GridSearch:
+    """
+    Breadth-first search over a w*h tile grid. Cells are addressed by flat
+    index y*w+x; parents and visited marks live in flat lists that are reused
+    between searches, so only the winning path is ever built.
+    """
+
+    def __init__(self, w, h):
+        self.w = w
+        self.h = h
+        self.parent = [-1]*(w*h)
+        self.seen = [0]*(w*h)
+        self.generation = 0
+        self.neighbours = neighbour_table(w, h)
+
+    def path_to(self, i):
+        path = []
+        while i != -1:
+            path.append((i % self.w, i // self.w))
+            i = self.parent[i]
+        path.reverse()
+        return path
+
+    def bfs(self, x, y, passable, goal):
+        """
+        Search outwards from (x, y).
+
+        Args:
+            passable (callable): passable(x, y) -> bool, whether the search may step onto a tile.
+            goal (callable): goal(x, y) -> result, checked when a tile is dequeued; the
+                search stops at the first tile whose result is not None.
+
+        Returns:
+            tuple: (path from (x, y) to the goal tile inclusive, goal result),
+                or ([], None) when no reachable tile is a goal.
+        """
+        self.generation += 1
+        generation = self.generation
+        seen = self.seen
+        parent = self.parent
+        neighbours = self.neighbours
+
+        start = y*self.w + x
+        seen[start] = generation
+        parent[start] = -1
+        frontier = deque(((start, x, y),))
+
+        while frontier:
+            i, px, py = frontier.popleft()
+
+            result = goal(px, py)
+            if result is not None:
+                return self.path_to(i), result
+
+            for ni, nx, ny in neighbours[i]:
+                if seen[ni] != generation and passable(nx, ny):
+                    seen[ni] = generation
+                    parent[ni] = i
+                    frontier.append((ni, nx, ny))
+
+        return [], None
+
+
+INFINITY = float('inf')
+
+class PathRepair:
+    """
+    D* Lite over the same grid: distances are searched from a goal back to
+    a start that may move, and kept between searches. When tiles change
+    whether they can be walked on, only the distances those tiles affect
+    are repaired, so replanning costs follow the changes, not the grid.
+    Values are stamped with a generation so starting over costs nothing.
+    """
+
+    def __init__(self, w, h):
+        self.w = w
+        self.h = h
+        self.neighbours = neighbour_table(w, h)
+        self.g = [INFINITY]*(w*h)
+        self.rhs = [INFINITY]*(w*h)
+        self.stamp = [0]*(w*h)
+        self.generation = 0
+        self.queue = [] # (key 1, key 2, cell), stale entries are skipped
+        self.queued = dict() # cell -> its current key in queue
+        self.goal = None
+        self.start = None
+        self.km = 0
+        self.changed = set()
+
+    def heuristic(self, a, b):
+        return abs(a % self.w - b % self.w) + abs(a // self.w - b // self.w)
+
+    def touch(self, i):
+        if self.stamp[i] != self.generation:
+            self.stamp[i] = self.generation
+            self.g[i] = self.rhs[i] = INFINITY
+
+    def key(self, i):
+        k = min(self.g[i], self.rhs[i])
+        return (k + self.heuristic(self.start, i) + self.km, k)
+
+    def reset(self, start, goal):
+        self.generation += 1
+        self.queue = []
+        self.queued.clear()
+        self.changed.clear()
+        self.km = 0
+        self.start = start
+        self.goal = goal
+        self.touch(goal)
+        self.rhs[goal] = 0
+        self.push(goal)
+
+    def forget(self):
+        self.goal = None
+        self.changed.clear()
+
+    def note_changes(self, tiles):
+        if self.goal is not None:
+            self.changed.update(y*self.w + x for x,y in tiles)
+
+    def push(self, i):
+        key = self.key(i)
+        self.queued[i] = key
+        heapq.heappush(self.queue, (key[0], key[1], i))
+
+    def update_vertex(self, i, passable):
+        self.touch(i)
+        if i != self.goal:
+            best = INFINITY
+            if passable(i % self.w, i // self.w):
+                for ni, nx, ny in self.neighbours[i]:
+                    self.touch(ni)
+                    if self.g[ni] + 1 < best and passable(nx, ny):
+                        best = self.g[ni] + 1
+            self.rhs[i] = best
+        self.queued.pop(i, None)
+        if self.g[i] != self.rhs[i]:
+            self.push(i)
+
+    def compute(self, passable):
+        queue, queued, g, rhs, start = self.queue, self.queued, self.g, self.rhs, self.start
+        self.touch(start)
+        while queue:
+            k1, k2, i = queue[0]
+            if queued.get(i) != (k1, k2):
+                heapq.heappop(queue)
+                continue
+            if (k1, k2) >= self.key(start) and rhs[start] == g[start]:
+                break
+            heapq.heappop(queue)
+            del queued[i]
+            new_key = self.key(i)
+            if (k1, k2) < new_key:
+                self.push(i)
+            elif g[i] > rhs[i]:
+                g[i] = rhs[i]
+                for ni, _, _ in self.neighbours[i]:
+                    self.update_vertex(ni, passable)
+            else:
+                g[i] = INFINITY
+                self.update_vertex(i, passable)
+                for ni, _, _ in self.neighbours[i]:
+                    self.update_vertex(ni, passable)
+
+    def path(self, x, y, goal_x, goal_y, passable):
+        """
+        Shortest path from (x, y) to the goal, both inclusive, reusing what
+        earlier calls for the same goal found. Empty when there is none.
+        """
+        start, goal = y*self.w + x, goal_y*self.w + goal_x
+        if goal != self.goal:
+            self.reset(start, goal)
+        else:
+            self.km += self.heuristic(self.start, start)
+            self.start = start
+            for i in self.changed:
+                self.update_vertex(i, passable)
+                for ni, _, _ in self.neighbours[i]:
+                    self.update_vertex(ni, passable)
+            self.changed.clear()
+        self.compute(passable)
+
+        g = self.g
+        if g[start] == INFINITY:
+            return []
+        path = [(x, y)]
+        i = start
+        while i != goal:
+            best = None
+            for ni, nx, ny in self.neighbours[i]:
+                self.touch(ni)
+                if g[ni] < g[i] and passable(nx, ny) and (best is None or g[ni] < g[best[0]]):
+                    best = (ni, nx, ny)
+            if best is None:
+                return []
+            i = best[0]
+            path.append(best[1:])
+        return path
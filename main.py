@@ -1,14 +1,33 @@
 import tkinter as tk
 from tkinter import ttk
+from functools import cached_property
 import constants
-from PIL import Image, ImageTk, ImageDraw
-from tkinter.filedialog import asksaveasfile, askopenfile
+from PIL import Image, ImageTk, ImageDraw, ImageSequence
+from tkinter.filedialog import asksaveasfilename, askopenfilename
+from tkinter.messagebox import showerror
 import spritesheeter
-import random
+import engine
+import spritecache
+import mapformat
+import render
+import mapedit
+import timestep
+import profiler
+import replay
+import botscheduler
+import botplanner
 import os
+from concurrent.futures import ProcessPoolExecutor
 import time
 import numpy as np
 
+SPRITE_CACHE = spritecache.SpriteCache()
+MAP_FILETYPES = [('Bomber Map', '*' + mapformat.TEXT_EXTENSION), ('Bomber Binary Map', '*' + mapformat.BINARY_EXTENSION)]
+BOT_BUDGET_MS = 6 # real time per frame the bots may spend deciding, see botscheduler
+BOT_WORKERS = min((os.cpu_count() or 1) - 1, 4) # processes planning the bots, on the Tk thread within BOT_BUDGET_MS if 0
+EDITOR_TOOLS = ('pencil', 'rectangle', 'flood fill', 'select', 'paste')
+FLAME_POOL_SIZE = 64 # flame items made up front, a radius 6 blast needs about 21
+
 def resize(image, width, height):
     if width is None and height is None:
         raise Exception('Both dimensions are None')
@@ -34,35 +53,21 @@ def load_sprite(blocksize, sprite_filepath):
     sprite = ImageTk.PhotoImage(image) 
     return sprite
 
+def key_gif_frame(image):
+    # dark pixels become transparent, the rest half see-through
+    data = np.array(image.convert('RGBA'))
+    dark = data[:,:,:3].sum(axis=2, dtype=np.int32) < 100
+    data[dark] = 0
+    data[~dark, 3] = 150
+    return Image.fromarray(data, 'RGBA')
+
+def gif_frames(filepath, width, height):
+    with Image.open(filepath) as gif:
+        return [key_gif_frame(resize_to_fit(frame.convert('RGBA'), width, height)) for frame in ImageSequence.Iterator(gif)]
+
 def load_gif(filepath, width, height):
-    gif = Image.open(filepath)
-    i = 0
-    frames = []
-    while True:
-        try:
-            gif.seek(i)
-            image = resize_to_fit(gif.convert('RGBA'), width, height)
-            # image: Image
-            pixels = np.array(image)
-            # print(pixels.shape)
-            for y in range(image.height):
-                for x in range(image.width):
-                    # print(pixels[x,y,0:3])
-                    if sum(pixels[x,y,0:3]) < 100:
-                        pixels[y,x] = [0,0,0,0]
-                    else:
-                        new_pixel = pixels[y,x]
-                        new_pixel[3] = 150
-                        pixels[y,x] = new_pixel
-            # print('end')
-            image = Image.fromarray(pixels, 'RGBA')
-            # image.show()
-            frames.append(ImageTk.PhotoImage(image))
-            i += 1
-        except Exception as e:
-            print(e)
-            break
-    return frames
+    return SPRITE_CACHE.get(('gif', filepath, width, height), [filepath], lambda: [gif_frames(filepath, width, height)],
+                            lambda frames: [ImageTk.PhotoImage(image) for image in frames[0]])
 
 
 def load_and_flatten_spritesheet(blocksize, filepath, alpha_threshold=0, min_length=0):
@@ -72,43 +77,25 @@ def load_and_flatten_spritesheet(blocksize, filepath, alpha_threshold=0, min_len
         s += row
     return list(map(ImageTk.PhotoImage, map(lambda x: resize_to_fit(x, blocksize, blocksize), s)))
 
+TINT_FACTOR = 0.4
+TINT_FACTORS = {
+    constants.RED: (1, TINT_FACTOR, TINT_FACTOR),
+    constants.GREEN: (TINT_FACTOR, 1, TINT_FACTOR),
+    constants.BLUE: (TINT_FACTOR, TINT_FACTOR, 1),
+    constants.YELLOW: (1, 1, TINT_FACTOR),
+    constants.CYAN: (TINT_FACTOR, 1, 1),
+    constants.PURPLE: (1, TINT_FACTOR, 1),
+    constants.BLACK: (TINT_FACTOR, TINT_FACTOR, TINT_FACTOR),
+    constants.WHITE: (1+TINT_FACTOR, 1+TINT_FACTOR, 1+TINT_FACTOR),
+}
+
 def tint_image(image, color):
-    r,g,b,a = image.split()
-    factor = 0.4
-    
-    if color == constants.RED:
-        g = Image.eval(g, lambda x: x*factor)
-        b = Image.eval(b, lambda x: x*factor)
-        return Image.merge('RGBA', (r,g,b,a))
-    elif color == constants.GREEN:
-        r = Image.eval(r, lambda x: x*factor)
-        b = Image.eval(b, lambda x: x*factor)
-        return Image.merge('RGBA', (r,g,b,a))
-    elif color == constants.BLUE:
-        g = Image.eval(g, lambda x: x*factor)
-        r = Image.eval(r, lambda x: x*factor)
-        return Image.merge('RGBA', (r,g,b,a))
-    elif color == constants.YELLOW:
-        b = Image.eval(b, lambda x: x*factor)
-        return Image.merge('RGBA', (r,g,b,a))
-    elif color == constants.CYAN:
-        r = Image.eval(r, lambda x: x*factor)
-        return Image.merge('RGBA', (r,g,b,a))
-    elif color == constants.PURPLE:
-        g = Image.eval(g, lambda x: x*factor)
-        return Image.merge('RGBA', (r,g,b,a))
-    elif color == constants.BLACK:
-        r = Image.eval(r, lambda x: x*factor)
-        g = Image.eval(g, lambda x: x*factor)
-        b = Image.eval(b, lambda x: x*factor)
-        return Image.merge('RGBA', (r,g,b,a))
-    elif color == constants.WHITE:
-        r = Image.eval(r, lambda x: min(255, x*(1+factor)))
-        g = Image.eval(g, lambda x: min(255, x*(1+factor)))
-        b = Image.eval(b, lambda x: min(255, x*(1+factor)))
-        return Image.merge('RGBA', (r,g,b,a))
-    
-    return image
+    if color not in TINT_FACTORS:
+        return image
+
+    data = np.array(image.convert('RGBA'), dtype=np.float32)
+    data[:,:,:3] *= TINT_FACTORS[color]
+    return Image.fromarray(np.minimum(data, 255).astype(np.uint8), 'RGBA')
     
 def resize_with_padding(image, desired_size):
     """
@@ -139,7 +126,7 @@ def resize_with_padding(image, desired_size):
     
     return padded_image
     
-def create_scalers(image, blocksize, topleft=0.7):
+def scaler_images(image, blocksize, topleft=0.7):
     positive = resize_with_padding(image, (blocksize, blocksize))
     negative = positive.copy()
 
@@ -165,16 +152,57 @@ def create_scalers(image, blocksize, topleft=0.7):
     draw = ImageDraw.Draw(negative)
     draw.polygon((a,b,g,d,e,c,f), fill='red')
 
-    return (ImageTk.PhotoImage(positive), ImageTk.PhotoImage(negative))
+    return positive, negative
+
+def create_scalers(image, blocksize, topleft=0.7):
+    return tuple(map(ImageTk.PhotoImage, scaler_images(image, blocksize, topleft)))
+
+class SpriteAtlas:
+    """
+    Tk images shared by every subprogram, each decoded and scaled once per
+    process for a given asset and size. Images are only built on first use,
+    so the atlas can exist before the Tk root does.
+    """
+
+    def __init__(self):
+        self.images = dict()
+
+    def get(self, key, build):
+        if key not in self.images:
+            self.images[key] = build()
+        return self.images[key]
+
+    def sprite(self, filepath, blocksize):
+        return self.get((filepath, blocksize), lambda: load_sprite(blocksize, filepath))
+
+    def scalers(self, filepath, blocksize, topleft=0.7):
+        return self.get((filepath, blocksize, 'scalers', topleft), lambda: create_scalers(Image.open(filepath), blocksize, topleft))
+
+    def spritesheet(self, filepath, blocksize, alpha_threshold=0, min_length=0):
+        return self.get((filepath, blocksize, alpha_threshold, min_length), lambda: load_and_flatten_spritesheet(blocksize, filepath, alpha_threshold, min_length))
+
+    def gif(self, filepath, width, height):
+        return self.get((filepath, width, height), lambda: load_gif(filepath, width, height))
+
+    def blocks(self, blocksize):
+        """Block value -> image for every block drawn as a sprite."""
+        def build():
+            sprites = dict()
+            sprites[constants.BARREL] = self.sprite('assets/barrel.png', blocksize)
+            sprites[constants.SPAWNPOINT] = self.sprite('assets/player_down_1.png', blocksize)
+            sprites[constants.SPEED_BUFF], sprites[constants.SPEED_DEBUFF] = self.scalers('assets/speed.png', blocksize)
+            sprites[constants.RADIUS_BUFF], sprites[constants.RADIUS_DEBUFF] = self.scalers('assets/radius.png', blocksize, 0.8)
+            sprites[constants.FUSE_BUFF], sprites[constants.FUSE_DEBUFF] = self.scalers('assets/fuse.png', blocksize, 0.2)
+            sprites[constants.COOLDOWN_BUFF], sprites[constants.COOLDOWN_DEBUFF] = self.scalers('assets/cooldown.png', blocksize, 0.8)
+            sprites[constants.SHIELD] = self.sprite('assets/shield.png', blocksize)
+            return sprites
+        return self.get(('blocks', blocksize), build)
+
+    def wall(self, blocksize):
+        return self.get(('wall', blocksize), lambda: ImageTk.PhotoImage(Image.new('RGBA', (blocksize+1, blocksize+1), (0,0,0,255))))
+
+SPRITE_ATLAS = SpriteAtlas()
 
-def randchoice(items, probabilities):
-    s = 0
-    c = random.random()
-    for i in range(len(items)):
-        s += probabilities[i]
-        if s >= c:
-            return items[i]
-        
 
 class ManualAnimation:
     def __init__(self, frames, frame_length):
@@ -242,13 +270,15 @@ class CanvasButton:
 
 
     def click(self, event):
+        # event coordinates are relative to the window, the items are placed relative to origin
         if self.placed and self.x2 >= event.x >= self.x1 and self.y2 >= event.y >= self.y1:
             self.command()
 
-    def place(self):
+    def place(self, origin=(0,0)):
         self.placed = True
-        self.rect_reference = self.canvas.create_rectangle(self.x1, self.y1, self.x2, self.y2, outline=self.color)
-        self.text_reference = self.canvas.create_text((self.x1+self.x2)/2, (self.y1+self.y2)/2, text=self.text, fill=self.color)
+        ox,oy = origin
+        self.rect_reference = self.canvas.create_rectangle(ox+self.x1, oy+self.y1, ox+self.x2, oy+self.y2, outline=self.color)
+        self.text_reference = self.canvas.create_text(ox+(self.x1+self.x2)/2, oy+(self.y1+self.y2)/2, text=self.text, fill=self.color)
 
     def hover(self, event):
         if not self.placed:
@@ -285,52 +315,41 @@ class CanvasButton:
             self.canvas.itemconfigure(self.rect_reference, fill='')
             self.canvas.itemconfigure(self.text_reference, fill=self.color)
 
-class BombProperties:
-    def __init__(self, x, y, radius, explodes_at=0):
-        self.x = x
-        self.y = y
-        self.radius = radius
-        self.explodes_at = explodes_at
-
-class Player:
+class PlayerSprite:
     LOOKING_DOWN = 0
     LOOKING_UP = 1
     LOOKING_LEFT  = 2
     LOOKING_RIGHT = 3
 
-    SPRITESHEET = spritesheeter.split('assets/player.png')
+    SPRITESHEET = spritesheeter.SpriteSheet('assets/player.png')
 
-    def __init__(self, blocksize, color, canvas_x, canvas_y, canvas):
-        def convert(image):
-            image = resize_to_fit(image, blocksize, blocksize)
-            image = tint_image(image, color)
-            return image
-        
-        self._images_pil = [ [convert(image) for image in row ] for row in self.SPRITESHEET ]
-        self.sprites = [ [ImageTk.PhotoImage(image) for image in row] for row in self._images_pil ]
-        self.sprites.append( [ ImageTk.PhotoImage(image.transpose(Image.FLIP_LEFT_RIGHT)) for image in self._images_pil[2]] )
-        self.color = color
+    def __init__(self, blocksize, player:engine.Player, canvas):
+        def build():
+            frames = [ [tint_image(resize_to_fit(image, blocksize, blocksize), player.color) for image in row] for row in self.SPRITESHEET.images ]
+            frames.append( [ image.transpose(Image.FLIP_LEFT_RIGHT) for image in frames[2]] )
+            return frames
+
+        def to_photo_images(frames):
+            return [ [ImageTk.PhotoImage(image) for image in row] for row in frames ]
+
+        self.sprites = SPRITE_CACHE.get(('player', self.SPRITESHEET.filepath, blocksize, player.color), [self.SPRITESHEET.filepath], build, to_photo_images)
+        self.player = player
         self.canvas_reference = None
         self.shield_canvas_reference = None
         self.canvas:tk.Canvas = canvas
-        self.canvas_x = canvas_x
-        self.canvas_y = canvas_y
         self.moving = 0
-        self.dead = False
-        self.time_of_last_bomb = 0
-        self.speed_to_frame_length_scaler = blocksize / 0.08
-        
-        self.speed = 1
-        self.bomb_cooldown = 2 # seconds
-        self.bomb_fuse = 1500 # ms
-        self.bomb_radius = 3 # tiles
-        self.shielded = False
 
         self.animation = ManualAnimation([self.sprites[self.LOOKING_DOWN][1]], 100)
         self.animation_direction = 0
         self.shield_animation = None
         self.blocksize = blocksize
 
+        # what the canvas currently shows, so unchanged frames cost no Tk calls
+        self.row = None
+        self.shown_image = None
+        self.shown_shield_image = None
+        self.shown_position = None
+
     def move(self, code):
         if code == 0:
             self.animation_direction = 0
@@ -343,16 +362,12 @@ class Player:
             self.moving = code
             self.animation = self.create_moving_animation()
 
-    def start_moving(self, direction):
-        self.move(self.moving | (1<<direction))
-
-    def stop_moving(self, direction):
-        self.move(self.moving ^ ((1<<direction)&self.moving))
-
+    def sync(self):
+        if self.player.moving != self.moving:
+            self.move(self.player.moving)
 
     def create_moving_animation(self):
-        FRAME_LENGTH =  int(100/self.speed)
-        # print(FRAME_LENGTH, 'fr')
+        FRAME_LENGTH =  int(100/self.player.speed)
         # frame_length = x / speed
         # 100 = x / blocksize/800
         if self.moving & constants.MOVING_UP:
@@ -381,173 +396,18 @@ class Player:
     def draw(self):
         if self.canvas_reference == None:
             sprite = self.sprites[self.LOOKING_DOWN][1]
-            self.canvas_reference = self.canvas.create_image(self.canvas_x, self.canvas_y, image=sprite, anchor='center')
-
-    x = property(lambda self: self.canvas_x//self.blocksize)
-    y = property(lambda self: self.canvas_y//self.blocksize)
-
-
-class Bot(Player):
-    TARGET_PLAYER = 0
-    TARGET_BARREL = 1
-    TARGET_BUFF = 2
-
-    def __init__(self, blocksize, color, canvas_x, canvas_y, canvas, func_speed_to_pixels_per_second, func_drop_bomb):
-        super().__init__(blocksize, color, canvas_x, canvas_y, canvas)
-        self.func_speed_to_pixels_per_second = func_speed_to_pixels_per_second
-        self.func_drop_bomb = func_drop_bomb
-        self.target = None
-        self.target_path = []
-
-    def evaluate(self, board, bombs:set[BombProperties], players):
-        def can_safely_detonate(x, y):
-            pass
-
-        def closest_path_to_safety(x, y, forbidden):
-            batch = [[(x,y)]]
-            visited = set()
-            while True:
-                # print(batch)
-                if len(batch) == 0:
-                    return []
-                
-                path = batch.pop(0)
-                px,py = path[-1]
-
-                if not path[-1] in forbidden:
-                    return path
-                
-                for nx,ny in [(px,py+1), (px,py-1), (px+1, py), (px-1, py)]:
-                    if w > nx >= 0 and h > ny >= 0 and (not (nx,ny) in visited) and (not board[ny][nx] in [constants.WALL, constants.BARREL]):
-                        new_path = path + [(nx,ny)]
-                        visited.add((nx,ny))
-                        batch.append(new_path)
-
-        def enemy_in_range(x, y):
-            for player in players:
-                if player is self:
-                    continue
-                dx,dy = player.x-x, player.y-y
-                if dx*dy == 0 and abs(dx+dy) < self.bomb_radius:
-                    return True
-            return False
-        
-        def mark_bomb(bomb:BombProperties, forbidden:set):
-            forbidden.add((bomb.x, bomb.y))
-            for dx in range(1, bomb.radius):
-                forbidden.add((bomb.x+dx, bomb.y))
-                forbidden.add((bomb.x-dx, bomb.y))
-            for dy in range(1, bomb.radius):
-                forbidden.add((bomb.x, bomb.y+dy))
-                forbidden.add((bomb.x, bomb.y-dy))
-        
-        def can_safely_detonate(x, y):
-            extra_forbidden = forbidden.copy()
-            my_bomb = BombProperties(x, y, self.bomb_radius)
-            mark_bomb(my_bomb, extra_forbidden)
-            path_to_safety = closest_path_to_safety(x, y, extra_forbidden)
-            blocks = len(path_to_safety)-1
-            if blocks == -1:
-                return False
-            pixel_distance = blocks*self.blocksize
-            return pixel_distance/pixel_speed < self.bomb_fuse/1000
-        
-        def find_target(x, y):
-            batch = [[(x,y)]]
-            visited = set()
-
-            while True:
-                if len(batch) == 0:
-                    # Honestly no idea when this could happen
-                    return
-                
-                path = batch.pop(0)
-                px, py = path[-1]
-
-                if board[py][px] in [constants.SPEED_BUFF, constants.RADIUS_BUFF, constants.FUSE_BUFF, constants.COOLDOWN_BUFF, constants.SHIELD]:
-                    self.target = self.TARGET_BUFF
-                    self.target_path = path
-                    return
-                
-                if enemy_in_range(px, py):
-                    self.target = self.TARGET_PLAYER
-                    self.target_path = path
-                    return
-                
-                for nx,ny in [(px,py+1), (px,py-1), (px+1, py), (px-1, py)]:
-                    if w > nx >= 0 and h > ny >= 0 and (not (nx,ny) in visited) and (not (nx,ny) in forbidden):
-                        if board[ny][nx] == constants.BARREL:
-                            if can_safely_detonate(px, py):
-                                self.target = self.TARGET_BARREL
-                                self.target_path = path
-                                return
-                        elif board[ny][nx] != constants.WALL:                        
-                            new_path = path + [(nx,ny)]
-                            visited.add((nx,ny))
-                            batch.append(new_path)
-
-        def follow_path(path):
-            dx,dy = path[0][0] - x, path[0][1] - y
-            code = 0
-
-            if dx <= -1:
-                code |= constants.MOVING_LEFT
-            elif dx >= 1:
-                code |= constants.MOVING_RIGHT
-
-            if dy <= -1:
-                code |= constants.MOVING_UP
-            elif dy >= 1:
-                code |= constants.MOVING_DOWN
-            
-            self.move(code)
-                
-
-        x,y = int(self.canvas_x//self.blocksize), int(self.canvas_y//self.blocksize)
-        h,w = len(board), len(board[0])
-        pixel_speed = self.func_speed_to_pixels_per_second(self.speed)
-
-        forbidden = set() # tiles with upcoming explosion
-        for bomb in bombs:
-            mark_bomb(bomb, forbidden)
-
-        for pos in self.target_path:
-            if pos in forbidden:
-                self.target = None
-                self.target_path = []
-                break
-
-        if (x,y) in forbidden:
-            self.target = None
-            self.target_path = closest_path_to_safety(x, y, forbidden)[1:]
-            if len(self.target_path) == 0:
-                self.move(0)
-                return
-            
-            follow_path(self.target_path)
-
-        elif time.time()-self.time_of_last_bomb > self.bomb_cooldown and enemy_in_range(x, y) and can_safely_detonate(x, y):
-            # print(f'{self.color} is dropping !')
-            self.func_drop_bomb()
-        elif self.target == None:
-            find_target(x, y)
-            # print('target', self.target)
-            if not self.target:
-                self.move(0)
-        else:            
-            # print('path', self.target_path, x, y, 'target', self.target)
-            if len(self.target_path) == 0:
-                if self.target == self.TARGET_BARREL and can_safely_detonate(x, y):
-                    self.func_drop_bomb()
-                self.target = None
-                return self.evaluate(board, bombs, players)
-            else:
-                if x == self.target_path[0][0] and y == self.target_path[0][1]:
-                    self.target_path.pop(0)
-                else:
-                    follow_path(self.target_path)
-
+            self.canvas_reference = self.canvas.create_image(self.player.pixel_x, self.player.pixel_y, image=sprite, anchor='center')
+            self.shown_image = sprite
+            self.shown_position = (self.player.pixel_x, self.player.pixel_y)
+            self.row = None
 
+    def destroy(self):
+        if self.canvas_reference:
+            self.canvas.delete(self.canvas_reference)
+            self.canvas_reference = None
+        if self.shield_canvas_reference:
+            self.canvas.delete(self.shield_canvas_reference)
+            self.shield_canvas_reference = None
 
 
 class Subprogram:
@@ -590,11 +450,21 @@ class LevelEditor(Subprogram):
         self.blocksize = blocksize
         self.size = size
         self.n_blocks = self.size//self.blocksize
-        self.board = [[constants.AIR]*self.n_blocks for i in range(self.n_blocks)]
+        self.board = engine.Board([[constants.AIR]*self.n_blocks for i in range(self.n_blocks)])
         self.board_references = [[None]*self.n_blocks for i in range(self.n_blocks)]
+        self.history = mapedit.History()
+        self.stroke = None # (x, y) -> (old, new) of the pencil stroke being drawn
+        self.drag_start = None
+        self.selection = None # x0, y0, x1, y1
+        self.clip = None # rows of blocks copied from the selection
         self.canvas = tk.Canvas(master=self.frame, width=size, height=size)
-        self.canvas.bind('<B1-Motion>', self.mouse_motion)
-        self.canvas.bind('<Button-1>', lambda e: self.place_current(e.x, e.y))
+        self.canvas.bind('<Button-1>', self.press)
+        self.canvas.bind('<B1-Motion>', self.drag)
+        self.canvas.bind('<ButtonRelease-1>', self.release)
+        self.canvas.bind_all('<Control-z>', lambda e: self.shortcut(self.undo))
+        self.canvas.bind_all('<Control-y>', lambda e: self.shortcut(self.redo))
+        self.canvas.bind_all('<Control-c>', lambda e: self.shortcut(self.copy))
+        self.canvas.bind_all('<Control-v>', lambda e: self.shortcut(lambda: self.tool_combo.current(EDITOR_TOOLS.index('paste'))))
         # self.canvas.bind_all('1', lambda e: self.placing_combo.current(0))
         # self.canvas.bind_all('2', lambda e: self.placing_combo.current(1))
         # self.canvas.bind_all('3', lambda e: self.placing_combo.current(2))
@@ -608,39 +478,48 @@ class LevelEditor(Subprogram):
         self.save_btn = tk.Button(master=self.toolbar, text='Save Map', command=self.save)
         self.back_to_menu_btn = tk.Button(master=self.toolbar, text='Back to menu', command=func_back_to_menu)
         self.reset_btn = tk.Button(master=self.toolbar, text='Reset', command=self.reset)
+        self.undo_btn = tk.Button(master=self.toolbar, text='Undo', command=self.undo)
+        self.redo_btn = tk.Button(master=self.toolbar, text='Redo', command=self.redo)
+        self.mirror_btn = tk.Button(master=self.toolbar, text='Mirror', command=self.mirror)
         self.placing_frame = tk.Frame(master=self.frame)
         combo_label = tk.Label(master=self.placing_frame, text='Placing: ')
         self.block_choice = tk.StringVar()
         self.placing_combo = ttk.Combobox(master=self.placing_frame, values=constants.BLOCK_NAMES, textvariable=self.block_choice, state='readonly')
         self.placing_combo.current(0)
+        tool_label = tk.Label(master=self.placing_frame, text='Tool: ')
+        self.tool_choice = tk.StringVar()
+        self.tool_combo = ttk.Combobox(master=self.placing_frame, values=EDITOR_TOOLS, textvariable=self.tool_choice, state='readonly')
+        self.tool_combo.current(0)
+        symmetry_label = tk.Label(master=self.placing_frame, text='Symmetry: ')
+        self.symmetry_choice = tk.StringVar()
+        self.symmetry_combo = ttk.Combobox(master=self.placing_frame, values=mapedit.SYMMETRIES, textvariable=self.symmetry_choice, state='readonly')
+        self.symmetry_combo.current(0)
         # self.placing_combo.bind('<<ComboboxSelected>>', lambda x: print(x, self.block_choice.get()))
 
         self.toolbar.grid(row=0, column=0, sticky='nswe')
         self.load_btn.pack(side=tk.LEFT, anchor='w')
         self.save_btn.pack(side=tk.LEFT, anchor='w')
+        self.undo_btn.pack(side=tk.LEFT, anchor='w')
+        self.redo_btn.pack(side=tk.LEFT, anchor='w')
+        self.mirror_btn.pack(side=tk.LEFT, anchor='w')
         self.back_to_menu_btn.pack(side=tk.RIGHT, anchor='e')
         self.reset_btn.pack(side=tk.RIGHT, anchor='e')
         self.canvas.grid(row=1, column=0)
         self.placing_frame.grid(row=2, column=0)
         combo_label.pack(side=tk.LEFT)
         self.placing_combo.pack(side=tk.LEFT)
+        tool_label.pack(side=tk.LEFT)
+        self.tool_combo.pack(side=tk.LEFT)
+        symmetry_label.pack(side=tk.LEFT)
+        self.symmetry_combo.pack(side=tk.LEFT)
 
         self.draw_grid()
+        self.outline = self.canvas.create_rectangle(0, 0, 0, 0, outline='blue', dash=(4, 2), width=2, state='hidden')
 
-        self.sprites = dict()
-        self.sprites[constants.BARREL] = load_sprite(blocksize, 'assets/barrel.png')
-        self.sprites[constants.SPAWNPOINT] = load_sprite(blocksize, 'assets/player_down_1.png')
-        self.sprites[constants.SPEED_BUFF], self.sprites[constants.SPEED_DEBUFF] = create_scalers(Image.open('assets/speed.png'), self.blocksize)
-        self.sprites[constants.RADIUS_BUFF], self.sprites[constants.RADIUS_DEBUFF] = create_scalers(Image.open('assets/radius.png'), self.blocksize, 0.8)
-        self.sprites[constants.FUSE_BUFF], self.sprites[constants.FUSE_DEBUFF] = create_scalers(Image.open('assets/fuse.png'), self.blocksize, 0.2)
-        self.sprites[constants.COOLDOWN_BUFF], self.sprites[constants.COOLDOWN_DEBUFF] = create_scalers(Image.open('assets/cooldown.png'), self.blocksize, 0.8)
-        self.sprites[constants.SHIELD] = load_sprite(blocksize, 'assets/shield.png')
+        self.sprites = SPRITE_ATLAS.blocks(blocksize)
 
     def reset(self):
-        for y in range(self.n_blocks):
-            for x in range(self.n_blocks):
-                self.board[y][x] = constants.AIR
-                self.redraw_block(x, y)
+        self.apply({cell: constants.AIR for cell in mapedit.rect_cells(0, 0, self.n_blocks-1, self.n_blocks-1)}, 'none')
 
     def draw_grid(self):
         for y in range(0, self.size, self.blocksize):
@@ -649,20 +528,109 @@ class LevelEditor(Subprogram):
         for x in range(0, self.size, self.blocksize):
             self.canvas.create_line(x,0,x,self.size)
 
-    def place_current(self, canvas_x, canvas_y):
-        x = canvas_x//self.blocksize
-        y = canvas_y//self.blocksize
-        
-        if x >= self.n_blocks or x < 0 or y >= self.n_blocks or y < 0:
+    def shortcut(self, func):
+        # the editor stays alive while hidden, its keys must not edit the map during a match
+        if self.frame.winfo_ismapped():
+            func()
+
+    def cell_at(self, canvas_x, canvas_y, clamp=False):
+        """The cell under the canvas point, None off the map unless clamp moves it to the nearest edge cell."""
+        x, y = canvas_x//self.blocksize, canvas_y//self.blocksize
+        if clamp:
+            return min(max(x, 0), self.n_blocks-1), min(max(y, 0), self.n_blocks-1)
+        if 0 <= x < self.n_blocks and 0 <= y < self.n_blocks:
+            return x, y
+        return None
+
+    def press(self, event):
+        block = constants.BLOCK_VALUES[self.block_choice.get()]
+        tool = self.tool_choice.get()
+        if tool in ('rectangle', 'select'):
+            cell = self.cell_at(event.x, event.y, clamp=True)
+            self.drag_start = cell
+            self.show_outline(cell, cell)
             return
-        
-        new_block = constants.BLOCK_VALUES[self.block_choice.get()]
+        cell = self.cell_at(event.x, event.y)
+        if tool == 'pencil':
+            self.stroke = dict()
+            if cell:
+                self.paint({cell: block})
+        elif cell is None:
+            return
+        elif tool == 'flood fill':
+            self.apply({c: block for c in mapedit.flood_cells(self.board, *cell)})
+        elif tool == 'paste' and self.clip:
+            self.apply(mapedit.paste_changes(self.board, self.clip, *cell))
+
+    def drag(self, event):
+        if self.stroke is not None:
+            cell = self.cell_at(event.x, event.y)
+            if cell:
+                self.paint({cell: constants.BLOCK_VALUES[self.block_choice.get()]})
+        elif self.drag_start:
+            self.show_outline(self.drag_start, self.cell_at(event.x, event.y, clamp=True))
+
+    def release(self, event):
+        if self.stroke is not None:
+            self.history.push(mapedit.Diff(self.n_blocks, self.stroke))
+            self.stroke = None
+        elif self.drag_start:
+            cell = self.cell_at(event.x, event.y, clamp=True)
+            if self.tool_choice.get() == 'rectangle':
+                self.canvas.itemconfigure(self.outline, state='hidden')
+                block = constants.BLOCK_VALUES[self.block_choice.get()]
+                self.apply({c: block for c in mapedit.rect_cells(*self.drag_start, *cell)})
+            else:
+                self.selection = (*self.drag_start, *cell)
+            self.drag_start = None
+
+    def show_outline(self, a, b):
+        x0, x1 = sorted((a[0], b[0]))
+        y0, y1 = sorted((a[1], b[1]))
+        bs = self.blocksize
+        self.canvas.coords(self.outline, x0*bs, y0*bs, (x1+1)*bs, (y1+1)*bs)
+        self.canvas.itemconfigure(self.outline, state='normal')
+        self.canvas.tag_raise(self.outline)
+
+    def write(self, changes, symmetry=None):
+        """Puts changes, (x, y) -> block, on the board and redraws once; returns (x, y) -> (old, new) of the cells that changed."""
+        changes = mapedit.with_symmetry(changes, self.n_blocks, self.n_blocks, symmetry or self.symmetry_choice.get())
+        written = dict()
+        for (x,y),block in changes.items():
+            old = self.board[y][x]
+            if self.board.set(x, y, block):
+                written[x,y] = (old, block)
+        self.redraw()
+        return written
+
+    def paint(self, changes):
+        for cell,(old,new) in self.write(changes).items():
+            self.stroke[cell] = (self.stroke[cell][0] if cell in self.stroke else old, new)
+
+    def apply(self, changes, symmetry=None):
+        self.history.push(mapedit.Diff(self.n_blocks, self.write(changes, symmetry)))
 
-        if self.board[y][x] == new_block or (self.board[y][x] != constants.AIR and new_block != constants.AIR):
+    def replay_cells(self, cells):
+        if cells is None:
             return
-        
-        self.board[y][x] = new_block
-        self.redraw_block(x,y)
+        for x,y,block in cells:
+            self.board.set(x, y, block)
+        self.redraw()
+
+    def undo(self):
+        if self.stroke is None:
+            self.replay_cells(self.history.undo())
+
+    def redo(self):
+        if self.stroke is None:
+            self.replay_cells(self.history.redo())
+
+    def copy(self):
+        if self.selection:
+            self.clip = mapedit.copy_region(self.board, *self.selection)
+
+    def mirror(self):
+        self.apply(mapedit.mirror_changes(self.board, self.symmetry_choice.get()), 'none')
 
     def redraw_block(self,x,y):
         if self.board_references[y][x]:
@@ -677,30 +645,29 @@ class LevelEditor(Subprogram):
             self.board_references[y][x] = ID
 
 
-    def mouse_motion(self, event):
-        # print(event.x, event.y)
-        self.place_current(event.x, event.y)
-
     def redraw(self):
-        for y in range(self.n_blocks):
-            for x in range(self.n_blocks):
-                self.redraw_block(x,y)
+        # only the cells changed since the last redraw
+        for x,y in self.board.advance():
+            self.redraw_block(x,y)
 
     def save(self):
-        file = asksaveasfile(defaultextension=[('Bomber Map', '*.map')], filetypes=[('Bomber Map', '*.map')])
-        if not file:
+        filepath = asksaveasfilename(defaultextension=mapformat.TEXT_EXTENSION, filetypes=MAP_FILETYPES)
+        if not filepath:
             return
-        file.write('\n'.join([ ' '.join([ str(self.board[y][x]) for x in range(self.n_blocks) ]) for y in range(self.n_blocks) ]))
-        file.close()
+        mapformat.write_board(filepath, self.board)
 
     def load(self):
-        file = askopenfile(defaultextension=[('Bomber Map', '*.map')], filetypes=[('Bomber Map', '*.map')])
-        if not file:
+        filepath = askopenfilename(defaultextension=mapformat.TEXT_EXTENSION, filetypes=MAP_FILETYPES)
+        if not filepath:
             return
-        for y,line in enumerate(file):
-            self.board[y] = list(map(int, line.split()))
+        before = [row[:] for row in self.board]
+        try:
+            self.board.assign(mapformat.read_board(filepath).tolist())
+        except (ValueError, mapformat.MapFormatError) as e:
+            showerror('Cannot load map', str(e))
+            return
+        self.history.push(mapedit.Diff(self.n_blocks, {(x,y): (before[y][x], self.board[y][x]) for x,y in self.board.dirty}))
         self.redraw()
-        file.close()
 
 
 
@@ -709,21 +676,32 @@ class Game(Subprogram):
         super().__init__(master)
         self.size = size
         self.blocksize = blocksize
-        self.n_blocks = size//blocksize
-        self.canvas = tk.Canvas(width=size, height=size, master=self.frame)
+        self.n_blocks = size//blocksize # tiles across the view, maps may be larger
+        self.canvas = render.CountingCanvas(width=size, height=size, master=self.frame)
         self.canvas.pack()
-        self.board = [[None]*self.n_blocks for i in range(self.n_blocks)]
-        self.canvas_references = [[None]*self.n_blocks for i in range(self.n_blocks)]
+        self.depth:render.DepthOrder = None
+        self.tiles:render.TileView = None
+        self.camera:render.Camera = None
+        self.flames:render.FlamePool = None
+        self.followed = 0 # index of the player the camera follows
+        self.board = None
+        self.frames_rendered = 0
+        self.tk_calls_rendering = 0
+        self.timestep = None
         self.game_map = None
         self.paused = True
-        self.players = []
-        self.bots = []
-        self.bombs:list[BombProperties] = set()
+        self.engine:engine.Engine = None
+        self.player_sprites:list[PlayerSprite] = []
+        self.bomb_items = dict() # bomb -> [canvas reference, shown frame index]
+        self.pause_references = None
+        self.profiler:profiler.Profiler = None
+        self.profiler_overlay = None
+        self.bot_executor = None
         self.func_back_to_menu = func_back_to_menu
-        bomb_and_explosion = load_and_flatten_spritesheet(self.blocksize+10, 'assets/bomb.png', 50, 20)
+        bomb_and_explosion = SPRITE_ATLAS.spritesheet('assets/bomb.png', self.blocksize+10, 50, 20)
         self.bomb_frames = bomb_and_explosion[:4]
         self.explosion_frames = bomb_and_explosion[4:-1]
-        self.player_shield_frames = load_gif('assets/shield_equipped.gif', blocksize+25, blocksize+25)
+        self.player_shield_frames = SPRITE_ATLAS.gif('assets/shield_equipped.gif', blocksize+25, blocksize+25)
         # print(self.player_shield_frames)
         self.shadow = ImageTk.PhotoImage(Image.new('RGBA', (self.size, self.size), (0,0,0,120)))
 
@@ -735,31 +713,8 @@ class Game(Subprogram):
         # self.fire_frames = load_and_flatten_spritesheet(self.blocksize+10, 'assets/fire.png', 0, 40)
         # self.death_frames = load_and_flatten_spritesheet(self.blocksize+30, 'assets/death.png', 0, 40)
 
-        self.sprites = dict()
-        self.sprites[constants.BARREL] = load_sprite(blocksize, 'assets/barrel.png')
-        self.sprites[constants.SPAWNPOINT] = load_sprite(blocksize, 'assets/player_down_1.png')
-        self.sprites[constants.SPEED_BUFF], self.sprites[constants.SPEED_DEBUFF] = create_scalers(Image.open('assets/speed.png'), self.blocksize)
-        self.sprites[constants.RADIUS_BUFF], self.sprites[constants.RADIUS_DEBUFF] = create_scalers(Image.open('assets/radius.png'), self.blocksize, 0.8)
-        self.sprites[constants.FUSE_BUFF], self.sprites[constants.FUSE_DEBUFF] = create_scalers(Image.open('assets/fuse.png'), self.blocksize, 0.2)
-        self.sprites[constants.COOLDOWN_BUFF], self.sprites[constants.COOLDOWN_DEBUFF] = create_scalers(Image.open('assets/cooldown.png'), self.blocksize, 0.8)
-        self.sprites[constants.SHIELD] = load_sprite(blocksize, 'assets/shield.png')
-
-        self.trinket_probabilities = [0]*9
-        tp = self.trinket_probabilities
-        tp[constants.SPEED_BUFF-4] =  10
-        tp[constants.SPEED_DEBUFF-4] = 10
-        tp[constants.FUSE_BUFF-4] = 8
-        tp[constants.FUSE_DEBUFF-4] = 8
-        tp[constants.COOLDOWN_BUFF-4] = 6
-        tp[constants.COOLDOWN_DEBUFF-4] = 6
-        tp[constants.RADIUS_BUFF-4] = 4
-        tp[constants.RADIUS_DEBUFF-4] = 4
-        tp[constants.SHIELD-4] = 5
-        s = sum(tp)
-        for i in range(len(tp)):
-            tp[i] /= s
-        # print(self.trinket_probabilities)
-
+        self.sprites = dict(SPRITE_ATLAS.blocks(blocksize))
+        self.sprites[constants.WALL] = SPRITE_ATLAS.wall(blocksize)
 
     def _mouse1(self, event):
         self.play_again_btn.click(event)
@@ -769,21 +724,26 @@ class Game(Subprogram):
         self.play_again_btn.hover(event)
         self.menu_btn.hover(event)
 
-    def redraw_block(self, x=None, y=None, canvas_x=None, canvas_y=None):
-        if x == None:
-            x = canvas_x//self.blocksize
-        if y == None:
-            y = canvas_y//self.blocksize
+    def redraw_block(self, x, y):
+        self.tiles.redraw(x, y)
 
-        if self.canvas_references[y][x]:
-            self.canvas.delete(self.canvas_references[y][x])
-        
-        if self.board[y][x] == constants.WALL:
-            # print('wall', x*self.blocksize, y*self.blocksize, x*self.blocksize+self.blocksize, y*self.blocksize+self.blocksize)
-            self.canvas_references[y][x] = self.canvas.create_rectangle(x*self.blocksize, y*self.blocksize, x*self.blocksize+self.blocksize, y*self.blocksize+self.blocksize, fill='black')
-        elif self.board[y][x] in self.sprites:
-            ID = self.canvas.create_image(x*self.blocksize+self.blocksize//2, y*self.blocksize+self.blocksize//2, image=self.sprites[self.board[y][x]])
-            self.canvas_references[y][x] = ID
+    def view_origin(self):
+        """Canvas coordinates of the top left corner of the view, where overlays go."""
+        return (self.camera.x, self.camera.y) if self.camera else (0, 0)
+
+    def follow_next(self):
+        players = self.engine.players
+        for i in range(1, len(players)+1):
+            if not players[(self.followed+i) % len(players)].dead:
+                self.followed = (self.followed+i) % len(players)
+                return
+
+    def update_camera(self):
+        if self.engine.players[self.followed].dead:
+            self.follow_next()
+        player = self.engine.players[self.followed]
+        if self.camera.follow(player.pixel_x, player.pixel_y):
+            self.tiles.show(*self.camera.tiles(self.blocksize, self.engine.w, self.engine.h))
 
     def initialize(self, n_humans, n_bots, game_map):
         self.n_humans = n_humans
@@ -791,113 +751,78 @@ class Game(Subprogram):
         self.game_map = game_map
         self.paused = True
         
-        with open('./maps/' + game_map, 'r') as f:
-            self.board = [[int(itm) for itm in line.split()] for line in f]
-
-        spawnpoints = []
-        for y in range(self.n_blocks):
-            for x in range(self.n_blocks):
-                if self.board[y][x] == constants.SPAWNPOINT:
-                    spawnpoints.append((x,y))
-                    self.board[y][x] = constants.AIR
-                
-                self.redraw_block(x,y)
-
-        random.shuffle(spawnpoints)
+        board = engine.load_map('./maps/' + game_map)
+        self.engine = engine.Engine(board, n_humans, n_bots, self.blocksize,
+                                    func_on_bomb_dropped=self.on_bomb_dropped,
+                                    func_on_explosion=self.on_explosion,
+                                    func_on_block_changed=self.redraw_block)
+        self.engine.recorder = replay.Recorder(self.engine, board)
+        if BOT_WORKERS > 0 and n_bots:
+            if self.bot_executor is None:
+                self.bot_executor = ProcessPoolExecutor(BOT_WORKERS)
+            self.engine.bot_planner = botplanner.BotPlanner(self.bot_executor, botscheduler.BotScheduler(BOT_BUDGET_MS))
+        else:
+            self.engine.bot_scheduler = botscheduler.BotScheduler(BOT_BUDGET_MS)
+        self.board = self.engine.board
+
+        if self.tiles:
+            self.tiles.destroy()
+            self.flames.destroy()
+            self.depth.destroy()
+        self.depth = render.DepthOrder(self.canvas, self.engine.h)
+        self.tiles = render.TileView(self.canvas, self.depth, self.board, self.blocksize, self.sprites.get)
+        self.flames = render.FlamePool(self.canvas, self.depth, self.explosion_frames, 100, FLAME_POOL_SIZE)
+        self.camera = render.Camera(self.canvas, self.size, self.size, self.engine.w*self.blocksize, self.engine.h*self.blocksize)
+        self.followed = 0
+        self.tiles.show(*self.camera.tiles(self.blocksize, self.engine.w, self.engine.h))
 
         # (UP,DOWN,LEFT,RIGHT,BOMB)
         BINDS = (('w','s','a','d','q'), ("Up", "Down", "Left", "Right", '/'), ('i','k','j','l','u'), ('t','g','f','h','r'))
+        # keys of players missing from this match would still hold the last match's players
+        for keys in BINDS:
+            for key in keys[:4]:
+                self.canvas.unbind_all(f'<KeyPress-{key}>')
+                self.canvas.unbind_all(f'<KeyRelease-{key}>')
+            self.canvas.unbind_all(keys[4])
         for i in range(n_humans):
-            x,y = spawnpoints[i]
-            self.players.append(Player(self.blocksize, i, x*self.blocksize+self.blocksize//2, y*self.blocksize+self.blocksize//2, self.canvas))
+            player = self.engine.players[i]
             for j in range(4):
-                self.canvas.bind_all(f'<KeyPress-{BINDS[i][j]}>', lambda event, j=j, player=self.players[i]: player.start_moving(j))
-                self.canvas.bind_all(f'<KeyRelease-{BINDS[i][j]}>', lambda event, j=j, player=self.players[i]: player.stop_moving(j))
-            self.canvas.bind_all(f'{BINDS[i][4]}', lambda event, player=self.players[i]: self.drop_bomb(player))
-
-        for j in range(n_bots):
-            x,y = spawnpoints[j+n_humans]
-            bot = Bot(self.blocksize, j+n_humans, x*self.blocksize+self.blocksize//2, y*self.blocksize+self.blocksize//2, self.canvas, lambda x: self.blocksize/15*x*60, None)
-            bot.func_drop_bomb = lambda b=bot: self.drop_bomb(b)
-            self.players.append(bot)
-            self.bots.append(bot)
-
-        for player in self.players:
-            player.draw()
-
-    def drop_bomb(self, player:Player):
-        if player.dead or time.time() - player.time_of_last_bomb < player.bomb_cooldown or self.paused:
+                self.canvas.bind_all(f'<KeyPress-{BINDS[i][j]}>', lambda event, j=j, player=player: self.engine.input_move(player, player.moving | (1<<j)))
+                self.canvas.bind_all(f'<KeyRelease-{BINDS[i][j]}>', lambda event, j=j, player=player: self.engine.input_move(player, player.moving & ~(1<<j)))
+            self.canvas.bind_all(f'{BINDS[i][4]}', lambda event, player=player: self.drop_bomb(player))
+        self.canvas.bind_all('<KeyPress-p>', lambda event: self.toggle_pause())
+        self.canvas.bind_all('<KeyPress-F3>', lambda event: self.toggle_profiler())
+        self.canvas.bind_all('<KeyPress-c>', lambda event: self.follow_next())
+
+        if self.profiler_overlay != None:
+            self.profiler = profiler.Profiler()
+        self.engine.profiler = self.profiler
+
+        self.player_sprites = [PlayerSprite(self.blocksize, player, self.canvas) for player in self.engine.players]
+        for sprite in self.player_sprites:
+            sprite.draw()
+        self.update_camera()
+
+    def drop_bomb(self, player:engine.Player):
+        if self.paused:
             return
-        
-        x,y = int(player.canvas_x//self.blocksize), int(player.canvas_y//self.blocksize)
-
-        for bomb in self.bombs:
-            if x == bomb.x and y == bomb.y:
-                return
-        
-        # print(time.time())
-        # print('drop', player.color, self.bombs)
-
-        bomb = BombProperties(x,y,player.bomb_radius)
-        canvas_x,canvas_y = x*self.blocksize + self.blocksize/2, y*self.blocksize + self.blocksize/2
-        player.time_of_last_bomb = time.time()
-        self.bombs.add(bomb)
-        animation = AnimationPlayer(self.bomb_frames, None, self.canvas, canvas_x, canvas_y, lambda: self.explode_bomb(bomb), True, player.bomb_fuse)
-        animation.play()
-
-    def explode_bomb(self, bomb:BombProperties):
-        # print('exploding...', len(self.explosion_frames))
-        canvas_x, canvas_y = bomb.x*self.blocksize + self.blocksize/2, bomb.y*self.blocksize + self.blocksize/2
-        animation = AnimationPlayer(self.explosion_frames, 100, self.canvas, canvas_x, canvas_y, destroy_reference_on_end=True)
-        animation.play()
+        self.engine.input_bomb(player)
+
+    def on_bomb_dropped(self, bomb:engine.BombProperties, player:engine.Player):
+        canvas_x,canvas_y = bomb.x*self.blocksize + self.blocksize/2, bomb.y*self.blocksize + self.blocksize/2
+        ID = self.canvas.create_image(canvas_x, canvas_y, image=self.bomb_frames[0])
+        self.depth.place_block(ID, bomb.y)
+        self.bomb_items[bomb] = [ID, 0]
+
+    def on_explosion(self, bomb:engine.BombProperties, tiles):
+        if bomb in self.bomb_items:
+            self.canvas.delete(self.bomb_items.pop(bomb)[0])
+        now = self.engine.tick*engine.TICK_MS
+        for x,y in filter(lambda tile: self.tiles.visible(*tile), tiles):
+            self.flames.spawn(x*self.blocksize+self.blocksize/2, y*self.blocksize+self.blocksize/2, y, now)
         # fire_animation = AnimationPlayer(self.fire_frames, 40, self.canvas, canvas_x, canvas_y, destroy_reference_on_end=True)
         # fire_animation.play()
 
-        x,y = bomb.x, bomb.y
-
-        for player in self.players:
-            px,py = player.canvas_x//self.blocksize, player.canvas_y//self.blocksize
-            if px == x and py == y:
-                self.hit(player)
-
-        for dx,dy in ((0,-1), (0,1), (-1,0), (1,0)):
-            for i in range(1, bomb.radius):
-                nx,ny = int(x+dx*i), int(y+dy*i)
-
-                if nx < 0 or nx >= self.n_blocks or ny < 0 or ny >= self.n_blocks or self.board[ny][nx] == constants.WALL:
-                    break
-
-                if self.board[ny][nx] == constants.BARREL:
-                    if random.random() < 0.5:
-                        self.board[ny][nx] = randchoice(list(range(4,13)), self.trinket_probabilities)
-                    else:
-                        self.board[ny][nx] = constants.AIR
-
-                    self.redraw_block(nx, ny)
-
-                for player in self.players:
-                    px,py = player.canvas_x//self.blocksize, player.canvas_y//self.blocksize
-                    if px == nx and py == ny:
-                        self.hit(player)
-
-                animation = AnimationPlayer(self.explosion_frames, 100, self.canvas, nx*self.blocksize+self.blocksize/2, ny*self.blocksize+self.blocksize/2, destroy_reference_on_end=True)
-                animation.play()
-        
-        self.bombs.remove(bomb)
-
-    def hit(self, player:Player):
-        if player.shielded:
-            player.shielded = False
-            player.shield_animation = None
-            self.canvas.delete(player.shield_canvas_reference)
-            player.shield_canvas_reference = None
-        else:
-            player.dead = True
-            self.canvas.delete(player.canvas_reference)
-            player.canvas_reference = None
-        
-        # AnimationPlayer(self.death_frames, 100, self.canvas, player.canvas_x, player.canvas_y, destroy_reference_on_end=True).play()
-
     def start(self):
         def update():
             dtime = time.time() - stime
@@ -906,6 +831,8 @@ class Game(Subprogram):
                 self.canvas.delete(shadow_reference)
                 self.canvas.delete(text_reference)
                 self.paused = False
+                self.timestep = timestep.FixedTimestep(engine.TICK_MS)
+                self.timestep.start()
                 self.loop()
                 return
             
@@ -915,127 +842,156 @@ class Game(Subprogram):
         MAX_FONT_SIZE = 50
         FONT_DELTA = 20
         stime = time.time()
-        shadow_reference = self.canvas.create_image(0,0, image=self.shadow, anchor='nw')
-        text_reference = self.canvas.create_text(self.size/2, self.size/2, anchor='center', text='3', font=f'Helvetica {MAX_FONT_SIZE}')
+        ox,oy = self.view_origin()
+        shadow_reference = self.canvas.create_image(ox, oy, image=self.shadow, anchor='nw')
+        text_reference = self.canvas.create_text(ox+self.size/2, oy+self.size/2, anchor='center', text='3', font=f'Helvetica {MAX_FONT_SIZE}')
 
         self.canvas.after(16, update)
 
+    def render_player(self, sprite:PlayerSprite, dt):
+        player = sprite.player
+
+        if player.dead:
+            sprite.destroy()
+            return
+
+        if player.shielded and sprite.shield_canvas_reference == None:
+            sprite.shield_animation = ManualAnimation(self.player_shield_frames, 150)
+            sprite.shield_canvas_reference = self.canvas.create_image(player.pixel_x, player.pixel_y, image=self.player_shield_frames[0])
+            sprite.shown_shield_image = self.player_shield_frames[0]
+            sprite.row = None
+        elif not player.shielded and sprite.shield_canvas_reference != None:
+            sprite.shield_animation = None
+            self.canvas.delete(sprite.shield_canvas_reference)
+            sprite.shield_canvas_reference = None
+
+        sprite.sync()
+        if sprite.animation:
+            sprite.animation.step(dt)
+            if sprite.animation.current_frame is not sprite.shown_image:
+                sprite.shown_image = sprite.animation.current_frame
+                self.canvas.itemconfigure(sprite.canvas_reference, image=sprite.shown_image)
+
+            if sprite.shield_animation:
+                sprite.shield_animation.step(dt)
+                if sprite.shield_animation.current_frame is not sprite.shown_shield_image:
+                    sprite.shown_shield_image = sprite.shield_animation.current_frame
+                    self.canvas.itemconfigure(sprite.shield_canvas_reference, image=sprite.shown_shield_image)
+
+        position = (player.pixel_x, player.pixel_y)
+        if position != sprite.shown_position:
+            sprite.shown_position = position
+            self.canvas.coords(sprite.canvas_reference, *position)
+            if sprite.shield_canvas_reference != None:
+                self.canvas.coords(sprite.shield_canvas_reference, *position)
+
+        if player.y != sprite.row:
+            sprite.row = player.y
+            self.depth.place_player(sprite.canvas_reference, sprite.row)
+            if sprite.shield_canvas_reference != None:
+                self.canvas.tag_raise(sprite.shield_canvas_reference, sprite.canvas_reference)
+
+    def render_bombs(self):
+        # bombs animate from their fuse in game time, so they freeze while paused
+        for bomb,item in self.bomb_items.items():
+            frame = min(int(bomb.fuse_burnt(self.engine.tick)*len(self.bomb_frames)), len(self.bomb_frames)-1)
+            if frame != item[1]:
+                item[1] = frame
+                self.canvas.itemconfigure(item[0], image=self.bomb_frames[frame])
+
+    def toggle_pause(self):
+        if self.engine is None or self.engine.finished or self.timestep is None:
+            return
+        if self.engine.paused:
+            for ID in self.pause_references:
+                self.canvas.delete(ID)
+            self.pause_references = None
+            self.engine.resume()
+            self.paused = False
+            self.timestep.start()
+        else:
+            self.engine.pause()
+            self.paused = True
+            ox,oy = self.view_origin()
+            self.pause_references = (self.canvas.create_image(ox, oy, image=self.shadow, anchor='nw'),
+                                     self.canvas.create_text(ox+self.size/2, oy+self.size/2, anchor='center', text='Paused', font='Helvetica 50'))
+
+    def toggle_profiler(self):
+        if self.profiler_overlay == None:
+            if self.profiler == None:
+                self.profiler = profiler.Profiler()
+            self.profiler_overlay = self.canvas.create_text(5, 5, anchor='nw', fill='white', font='Courier 10', text='')
+        else:
+            self.canvas.delete(self.profiler_overlay)
+            self.profiler_overlay = None
+            self.profiler = None
+        if self.engine:
+            self.engine.profiler = self.profiler
+
+    def update_profiler_overlay(self):
+        ox,oy = self.view_origin()
+        self.canvas.coords(self.profiler_overlay, ox+5, oy+5)
+        self.canvas.itemconfigure(self.profiler_overlay, text=self.profiler.report(limit=12))
+        self.canvas.tag_raise(self.profiler_overlay)
+
+    def save_profile(self):
+        name = f'profiles/{self.game_map.rsplit(".", 1)[0]}-{time.strftime("%Y%m%d-%H%M%S")}'
+        self.profiler.write_csv(name + '.csv')
+        self.profiler.write_json(name + '.json')
+        print(f'profile written to {name}.csv and {name}.json')
+
     def loop(self):
-        for bot in self.bots:
-            bot:Bot
-            bot.evaluate(self.board, self.bombs, self.players)
-
-        n_alive = 0
-        for player in sorted(self.players, key=lambda player: player.canvas_y):
-            if player.dead:
-                continue
-
-            n_alive += 1
-            player:Player
-
-            move = [0,0]
-            if player.moving & constants.MOVING_UP:
-                move[1] -= 1
-            if player.moving & constants.MOVING_DOWN:
-                move[1] += 1
-            if player.moving & constants.MOVING_LEFT:
-                move[0] -= 1
-            if player.moving & constants.MOVING_RIGHT:
-                move[0] += 1
-            
-            value = (move[0]**2 + move[1]**2)**0.5
-
-            if value != 0:
-                SCALE = self.blocksize/15*player.speed
-                move = (move[0]/value*SCALE, move[1]/value*SCALE)
-                oldx,oldy = int(player.canvas_x//self.blocksize), int(player.canvas_y//self.blocksize)
-
-                player.canvas_x += move[0]
-                player.canvas_y += move[1]
-
-                x,y = int(player.canvas_x//self.blocksize), int(player.canvas_y//self.blocksize)
-                # print(x,y)
-                if x < 0 or x >= self.n_blocks or self.board[oldy][x] in [constants.WALL, constants.BARREL]:
-                    player.canvas_x -= move[0]
-                if y < 0 or y >= self.n_blocks or self.board[y][oldx] in [constants.WALL, constants.BARREL]:
-                    player.canvas_y -= move[1]
-
-            if player.animation:
-                player.animation.step(16)
-                self.canvas.itemconfigure(player.canvas_reference, image=player.animation.current_frame)
-                self.canvas.tag_raise(player.canvas_reference)
-
-                if player.shield_animation:
-                    player.shield_animation.step(16)
-                    self.canvas.itemconfigure(player.shield_canvas_reference, image=player.shield_animation.current_frame)
-                    self.canvas.tag_raise(player.shield_canvas_reference)
-
-                # print(player.animation.time)
-            # print(player.shield_canvas_reference, player.canvas_x, player.canvas_y)
-            self.canvas.coords(player.canvas_reference, player.canvas_x, player.canvas_y)
-            if player.shield_canvas_reference != None:
-                self.canvas.coords(player.shield_canvas_reference, player.canvas_x, player.canvas_y)
-            
-            x,y = int(player.canvas_x//self.blocksize), int(player.canvas_y//self.blocksize)
-            
-            match self.board[y][x]:
-                case constants.SPEED_BUFF:
-                    player.speed *= 1.2
-                case constants.SPEED_DEBUFF:
-                    player.speed /= 1.2
-                case constants.RADIUS_BUFF:
-                    player.bomb_radius += 1
-                case constants.RADIUS_DEBUFF:
-                    player.bomb_radius = max(player.bomb_radius-1, 1)
-                case constants.FUSE_BUFF:
-                    player.bomb_fuse /= 1.2
-                case constants.FUSE_DEBUFF:
-                    player.bomb_fuse *= 1.2
-                case constants.COOLDOWN_BUFF:
-                    player.bomb_cooldown /= 1.4
-                case constants.COOLDOWN_DEBUFF:
-                    player.bomb_cooldown *= 1.4
-                case constants.SHIELD:
-                    if not player.shielded:
-                        player.shielded = True
-                        player.shield_animation = ManualAnimation(self.player_shield_frames, 150)
-                        player.shield_canvas_reference = self.canvas.create_image(player.canvas_x, player.canvas_y, image=self.player_shield_frames[0])
-
-            if constants.SHIELD >= self.board[y][x] >= constants.SPEED_BUFF:
-                self.board[y][x] = constants.AIR
-                self.redraw_block(x,y)
-
-            y += 1
-            for x in range(x-1, x+2):
-                if 0 <= y < self.n_blocks and 0 <= x < self.n_blocks:
-                    # self.redraw_block(x, y)
-                    if self.canvas_references[y][x]:
-                        self.canvas.tag_raise(self.canvas_references[y][x])
-
-        if n_alive < 2:
-            self.endgame(n_alive)
+        if self.engine.paused:
+            self.canvas.after(engine.TICK_MS, self.loop)
+            return
+
+        steps = self.timestep.advance()
+        if self.engine.bot_scheduler:
+            self.engine.bot_scheduler.begin_frame()
+        for _ in range(steps):
+            self.engine.step()
+            if self.engine.finished:
+                break
+
+        if steps:
+            if self.profiler:
+                self.profiler.lap()
+            calls = self.canvas.calls
+            self.update_camera()
+            for sprite in self.player_sprites:
+                self.render_player(sprite, steps*engine.TICK_MS)
+            self.render_bombs()
+            self.flames.update(self.engine.tick*engine.TICK_MS)
+            self.tk_calls_rendering += self.canvas.calls - calls
+            self.frames_rendered += 1
+            if self.profiler:
+                self.profiler.lap('render')
+                self.profiler.end_frame()
+                if self.profiler.frames % 30 == 0:
+                    self.update_profiler_overlay()
+
+        if self.engine.finished:
+            self.endgame(self.engine.winner)
         else:
-            self.canvas.after(16, self.loop)
+            self.canvas.after(max(1, int(self.timestep.until_next_step())), self.loop)
 
-    def endgame(self, n_alive):
+    def endgame(self, winner:engine.Player):
         def clean():
             self.canvas.delete(shadow_reference)
             self.canvas.delete(text_reference)
             self.play_again_btn.destroy()
             self.menu_btn.destroy()
-            for player in self.players:
-                player:Player
-                if player.canvas_reference:
-                    self.canvas.delete(player.canvas_reference)
-                if player.shield_canvas_reference:
-                    self.canvas.delete(player.shield_canvas_reference)
-            self.players.clear()
-            self.bots.clear()
+            for sprite in self.player_sprites:
+                sprite.destroy()
+            self.player_sprites.clear()
+            for ID,_ in self.bomb_items.values():
+                self.canvas.delete(ID)
+            self.bomb_items.clear()
+            self.flames.clear()
 
         def restart():
             clean()
             self.initialize(self.n_humans, self.n_bots, self.game_map)
-            print('calling start')
             self.start()
 
         def back_to_menu():
@@ -1043,29 +999,37 @@ class Game(Subprogram):
             self.func_back_to_menu()
 
         self.paused = True
-        shadow_reference = self.canvas.create_image(0, 0, anchor='nw', image=self.shadow)
+        print(f'{self.tk_calls_rendering/max(self.frames_rendered, 1):.1f} Tk calls per frame rendering players')
+        print(self.timestep.report())
+        if self.engine.bot_planner:
+            self.engine.bot_planner.cancel()
+            print(self.engine.bot_planner.report())
+        elif self.engine.bot_scheduler:
+            print(self.engine.bot_scheduler.report())
+        if self.profiler:
+            self.save_profile()
+            self.update_profiler_overlay()
+        replay.save(f'replays/{self.game_map.rsplit(".", 1)[0]}-{time.strftime("%Y%m%d-%H%M%S")}{replay.EXTENSION}', self.engine.recorder.replay)
+        self.tk_calls_rendering = 0
+        self.frames_rendered = 0
+        ox,oy = self.view_origin()
+        shadow_reference = self.canvas.create_image(ox, oy, anchor='nw', image=self.shadow)
         FONT = 'Helvetica 40'
 
-        if n_alive == 0:
+        if winner == None:
             text = 'Tie'
             color = 'white'
         else:
-            alive = None
-            for player in self.players:
-                player: Player
-                if not player.dead:
-                    alive = player
-                    break
-            text = f'{constants.COLOR_NAMES[player.color].capitalize()} wins!!!'
-            color = constants.COLOR_NAMES[player.color]
+            text = f'{constants.COLOR_NAMES[winner.color].capitalize()} wins!!!'
+            color = constants.COLOR_NAMES[winner.color]
 
-        text_reference = self.canvas.create_text(self.size/2, self.size/2-30, text=text, fill=color, anchor='center', font=FONT)
+        text_reference = self.canvas.create_text(ox+self.size/2, oy+self.size/2-30, text=text, fill=color, anchor='center', font=FONT)
         self.play_again_btn.set_color(color)
         self.play_again_btn.command = restart
         self.menu_btn.command = back_to_menu
         self.menu_btn.set_color(color)
-        self.play_again_btn.place()
-        self.menu_btn.place()
+        self.play_again_btn.place((ox,oy))
+        self.menu_btn.place((ox,oy))
                         
 
 class LevelSelector(Subprogram):
@@ -1082,7 +1046,8 @@ class LevelSelector(Subprogram):
         self.lvl_label = tk.Label(master=self.frame, text='Select Level: ')
         self.map_name = tk.StringVar()
         self.lvl_combox = ttk.Combobox(master=self.frame, textvariable=self.map_name, state='readonly')
-        self.lvl_combox['values'] = os.listdir('maps/')
+        self.catalog = mapformat.Catalog('maps').refresh()
+        self.lvl_combox['values'] = self.catalog.names()
         self.lvl_combox.current(0)
         self.lvl_combox.bind('<<ComboboxSelected>>', self.selection_changed)
         self.human_count = RangePicker(self.frame, 'Number of Players: ', 0, 4, 1, can_add)
@@ -1101,7 +1066,7 @@ class LevelSelector(Subprogram):
         # print(self.max_players)
 
     def refresh(self):
-        self.lvl_combox.configure(values=os.listdir('maps/'))
+        self.lvl_combox.configure(values=self.catalog.refresh().names())
         self.selection_changed()
 
     def selection_changed(self, event=None):
@@ -1117,8 +1082,9 @@ class LevelSelector(Subprogram):
         # print(self.max_players, event)
 
     def get_max_players(self, map_name):
-        with open('./maps/' + map_name, 'r') as f:
-            return f.read().count(str(constants.SPAWNPOINT))
+        if map_name not in self.catalog:
+            return 0
+        return self.catalog[map_name]['spawnpoints']
 
 class Program:
     def __init__(self):
@@ -1140,11 +1106,16 @@ class Program:
 
         self.level_selector = LevelSelector(self.window, self.from_level_select_to_menu, self.start_game)
 
-        self.level_editor = LevelEditor(self.window, self.size, self.blocksize, self.from_editor_to_menu)
+        self.menu_frame.pack()
 
-        self.game = Game(self.window, self.size, self.blocksize, self.from_game_to_menu)
+    # the editor and the game load their sprites when first opened, not at startup
+    @cached_property
+    def level_editor(self):
+        return LevelEditor(self.window, self.size, self.blocksize, self.from_editor_to_menu)
 
-        self.menu_frame.pack()
+    @cached_property
+    def game(self):
+        return Game(self.window, self.size, self.blocksize, self.from_game_to_menu)
 
     def from_game_to_menu(self):
         self.game.frame.pack_forget()
@@ -1192,4 +1163,6 @@ if __name__ == '__main__':
     # canvas.pack()
 
     tk.mainloop()
-        
+    game = vars(p).get('game') # only there if a match was played
+    if game and game.bot_executor:
+        game.bot_executor.shutdown(cancel_futures=True)
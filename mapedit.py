@@ -0,0 +1,148 @@
+from array import array
+from collections import deque
+
+SYMMETRIES = ('none', 'mirror x', 'mirror y', 'mirror both', 'rotate')
+
+
+def rect_cells(x0, y0, x1, y1):
+    """Cells of the rectangle with corners (x0, y0) and (x1, y1), both inclusive, in any order."""
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    return [(x, y) for y in range(y0, y1+1) for x in range(x0, x1+1)]
+
+def flood_cells(board, x, y):
+    """The 4-connected cells holding the same block as (x, y)."""
+    h,w = len(board), len(board[0])
+    block = board[y][x]
+    seen = {(x,y)}
+    frontier = deque(((x,y),))
+    while frontier:
+        cx,cy = frontier.popleft()
+        for nx,ny in ((cx,cy+1), (cx,cy-1), (cx+1,cy), (cx-1,cy)):
+            if 0 <= nx < w and 0 <= ny < h and (nx,ny) not in seen and board[ny][nx] == block:
+                seen.add((nx,ny))
+                frontier.append((nx,ny))
+    return list(seen)
+
+def symmetric_cells(x, y, w, h, symmetry):
+    """(x, y) and the cells symmetry pairs it with on a w*h board."""
+    mx, my = w-1-x, h-1-y
+    if symmetry == 'mirror x':
+        return {(x,y), (mx,y)}
+    if symmetry == 'mirror y':
+        return {(x,y), (x,my)}
+    if symmetry == 'mirror both':
+        return {(x,y), (mx,y), (x,my), (mx,my)}
+    if symmetry == 'rotate':
+        return {(x,y), (mx,my)}
+    return {(x,y)}
+
+def with_symmetry(changes, w, h, symmetry):
+    """changes, a dict (x, y) -> block, with every cell's block also painted on the cells paired with it."""
+    if symmetry == 'none':
+        return changes
+    painted = dict()
+    for (x,y),block in changes.items():
+        for cell in symmetric_cells(x, y, w, h, symmetry):
+            painted[cell] = block
+    return painted
+
+def mirror_changes(board, symmetry):
+    """Changes that make the second half of the board a copy of the first, paired by symmetry."""
+    h,w = len(board), len(board[0])
+    changes = dict()
+    for y in range(h):
+        for x in range(w):
+            if symmetry == 'mirror x':
+                source = (min(x, w-1-x), y)
+            elif symmetry == 'mirror y':
+                source = (x, min(y, h-1-y))
+            elif symmetry == 'mirror both':
+                source = (min(x, w-1-x), min(y, h-1-y))
+            elif symmetry == 'rotate':
+                source = (x, y) if (y, x) <= (h-1-y, w-1-x) else (w-1-x, h-1-y)
+            else:
+                return changes
+            sx,sy = source
+            if board[y][x] != board[sy][sx]:
+                changes[x,y] = board[sy][sx]
+    return changes
+
+def copy_region(board, x0, y0, x1, y1):
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    return [row[x0:x1+1] for row in board[y0:y1+1]]
+
+def paste_changes(board, clip, x, y):
+    """Changes that put clip with its top left corner on (x, y), cut off at the board's edges."""
+    h,w = len(board), len(board[0])
+    return {(x+i, y+j): block for j,row in enumerate(clip) for i,block in enumerate(row) if x+i < w and y+j < h}
+
+
+class Diff:
+    """
+    One edit as runs of consecutive cells, row by row, that had the same old
+    block and got the same new block; each run is three uint32s: cells
+    skipped since the previous run, its length and old << 8 | new.
+    """
+
+    def __init__(self, w, changes):
+        """changes: dict (x, y) -> (old block, new block), cells whose blocks stayed are left out."""
+        self.w = w
+        self.runs = array('I')
+        end = 0
+        for i,(old,new) in sorted((y*w + x, blocks) for (x,y),blocks in changes.items() if blocks[0] != blocks[1]):
+            code = old << 8 | new
+            runs = self.runs
+            if runs and i == end and runs[-1] == code:
+                runs[-2] += 1
+            else:
+                runs.extend((i - end, 1, code))
+            end = i + 1
+
+    def __len__(self):
+        return sum(self.runs[1::3])
+
+    def cells(self, undo=False):
+        """(x, y, block) of every cell, block being the new one or the old one if undo."""
+        i = 0
+        runs = self.runs
+        for r in range(0, len(runs), 3):
+            i += runs[r]
+            block = runs[r+2] >> 8 if undo else runs[r+2] & 0xFF
+            for j in range(i, i + runs[r+1]):
+                yield j % self.w, j // self.w, block
+            i += runs[r+1]
+
+    def nbytes(self):
+        return self.runs.itemsize * len(self.runs)
+
+
+class History:
+    """Undo and redo stacks of Diffs, the oldest edits are dropped past limit."""
+
+    def __init__(self, limit=10000):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+
+    def push(self, diff:Diff):
+        if len(diff):
+            self.undo_stack.append(diff)
+            self.redo_stack.clear()
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        diff = self.undo_stack.pop()
+        self.redo_stack.append(diff)
+        return diff.cells(undo=True)
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        diff = self.redo_stack.pop()
+        self.undo_stack.append(diff)
+        return diff.cells()
+
+    def nbytes(self):
+        return sum(diff.nbytes() for diff in self.undo_stack) + sum(diff.nbytes() for diff in self.redo_stack)
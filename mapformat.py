@@ -0,0 +1,158 @@
+import json
+import os
+import struct
+import numpy as np
+import constants
+
+TEXT_EXTENSION = '.map'
+BINARY_EXTENSION = '.bmap'
+EXTENSIONS = (TEXT_EXTENSION, BINARY_EXTENSION)
+
+MAGIC = b'BMAP'
+VERSION = 1
+# magic, version, padding, width, height, spawnpoints; cells follow as w*h uint8 row by row
+HEADER = struct.Struct('<4sBxHHH')
+
+CATALOG_PATH = '.cache/maps_catalog.json'
+
+
+class MapFormatError(Exception):
+    pass
+
+
+def read_text(filepath):
+    with open(filepath, 'r') as f:
+        lines = [line.split() for line in f if line.strip()]
+    if not lines or any(len(line) != len(lines[0]) for line in lines):
+        raise MapFormatError(f'{filepath} is not a rectangular map')
+    try:
+        cells = np.array(lines, dtype=np.int64)
+    except (ValueError, OverflowError):
+        raise MapFormatError(f'{filepath} has cells that are not integers')
+    if cells.min() < 0 or cells.max() > 255:
+        raise MapFormatError(f'{filepath} has cells outside 0-255')
+    return cells.astype(np.uint8)
+
+def write_text(filepath, board):
+    with open(filepath, 'w') as f:
+        f.write('\n'.join(' '.join(str(int(cell)) for cell in row) for row in board))
+
+def read_header(filepath):
+    with open(filepath, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise MapFormatError(f'{filepath} is too short for a map header')
+    magic, version, w, h, spawnpoints = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise MapFormatError(f'{filepath} is not a version {VERSION} binary map')
+    return w, h, spawnpoints
+
+def read_binary(filepath):
+    """The cells as a read-only (h, w) memory map, nothing is read until used."""
+    w, h, _ = read_header(filepath)
+    return np.memmap(filepath, dtype=np.uint8, mode='r', offset=HEADER.size, shape=(h, w))
+
+def write_binary(filepath, board):
+    board = np.asarray(board, dtype=np.uint8)
+    h, w = board.shape
+    with open(filepath, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, w, h, int(np.count_nonzero(board == constants.SPAWNPOINT))))
+        f.write(np.ascontiguousarray(board).tobytes())
+
+def read_board(filepath):
+    if filepath.endswith(BINARY_EXTENSION):
+        return read_binary(filepath)
+    return read_text(filepath)
+
+def write_board(filepath, board):
+    if filepath.endswith(BINARY_EXTENSION):
+        write_binary(filepath, board)
+    else:
+        write_text(filepath, board)
+
+def describe(filepath):
+    board = read_board(filepath)
+    st = os.stat(filepath)
+    histogram = np.bincount(board.ravel(), minlength=len(constants.BLOCK_NAMES))
+    return {
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'width': int(board.shape[1]),
+        'height': int(board.shape[0]),
+        'spawnpoints': int(histogram[constants.SPAWNPOINT]),
+        'histogram': histogram.tolist(),
+    }
+
+
+class Catalog:
+    """
+    Index of the maps in a directory, persisted as JSON. refresh() only
+    re-reads files whose mtime or size changed since the last refresh.
+    """
+
+    def __init__(self, maps_dir='maps', catalog_path=CATALOG_PATH):
+        self.maps_dir = maps_dir
+        self.catalog_path = catalog_path
+        self.entries = {}
+        try:
+            with open(catalog_path, 'r') as f:
+                data = json.load(f)
+            if data.get('maps_dir') == os.path.abspath(maps_dir):
+                self.entries = data['maps']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def refresh(self):
+        entries = {}
+        changed = False
+        with os.scandir(self.maps_dir) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.endswith(EXTENSIONS):
+                    continue
+                st = entry.stat()
+                old = self.entries.get(entry.name)
+                if old and old['mtime_ns'] == st.st_mtime_ns and old['size'] == st.st_size:
+                    entries[entry.name] = old
+                    continue
+                try:
+                    entries[entry.name] = describe(entry.path)
+                except (MapFormatError, ValueError):
+                    continue
+                changed = True
+
+        changed = changed or entries.keys() != self.entries.keys()
+        self.entries = entries
+        if changed:
+            self.save()
+        return self
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.catalog_path) or '.', exist_ok=True)
+            with open(self.catalog_path + '.tmp', 'w') as f:
+                json.dump({'maps_dir': os.path.abspath(self.maps_dir), 'maps': self.entries}, f)
+            os.replace(self.catalog_path + '.tmp', self.catalog_path)
+        except OSError:
+            pass
+
+    def names(self):
+        return sorted(self.entries)
+
+    def __getitem__(self, name):
+        return self.entries[name]
+
+    def __contains__(self, name):
+        return name in self.entries
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Convert maps between the text and binary formats.')
+    parser.add_argument('maps', nargs='+')
+    parser.add_argument('--to', choices=('text', 'binary'), default='binary')
+    args = parser.parse_args()
+
+    extension = BINARY_EXTENSION if args.to == 'binary' else TEXT_EXTENSION
+    for filepath in args.maps:
+        out = os.path.splitext(filepath)[0] + extension
+        write_board(out, read_board(filepath))
+        print(f'{filepath} -> {out}')
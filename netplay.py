@@ -0,0 +1,331 @@
+import asyncio
+import itertools
+import json
+import random
+import socket
+import time
+from collections import deque
+import constants
+import engine
+import replay
+import timestep
+
+PORT = 5555
+SNAPSHOT_EVERY = 3 # ticks between snapshots, about 20 a second
+INTERPOLATION_DELAY = 2*SNAPSHOT_EVERY # ticks the client renders behind the newest snapshot
+
+
+def encode(message):
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+def player_fields(player:engine.Player):
+    return {'x': round(player.pixel_x, 1), 'y': round(player.pixel_y, 1), 'm': player.moving, 'd': player.dead, 's': player.shielded}
+
+def bomb_fields(bomb:engine.BombProperties):
+    return [bomb.x, bomb.y, bomb.dropped_at, bomb.explodes_at]
+
+def is_input(message):
+    """Whether a decoded client message is a well formed input, an object with an int 'move' and/or a bool 'bomb'."""
+    return (isinstance(message, dict)
+            and type(message.get('move', 0)) is int
+            and isinstance(message.get('bomb', False), bool))
+
+
+class Server:
+    """
+    Runs the authoritative match and streams it to the clients as snapshots.
+    A snapshot only holds the tiles and player fields that changed since the
+    previous one, it is encoded once and the same bytes go to every client.
+    Remote players send their inputs, which go through the engine's input
+    methods, so a match played over the network is recorded like any other.
+    A client sending a malformed message is dropped.
+    """
+
+    def __init__(self, board, n_humans, n_bots, seed=None, snapshot_every=SNAPSHOT_EVERY):
+        self.engine = engine.Engine(board, n_humans, n_bots, seed=seed,
+                                    func_on_bomb_dropped=self.on_bomb_dropped,
+                                    func_on_explosion=self.on_explosion,
+                                    func_on_block_changed=self.on_block_changed)
+        self.engine.recorder = replay.Recorder(self.engine, board)
+        self.snapshot_every = snapshot_every
+        self.writers = dict() # color -> StreamWriter of the human playing it
+        self.handlers = set()
+        self.dirty_tiles = set()
+        self.new_bombs = []
+        self.explosions = []
+        self.sent_players = {player.color: player_fields(player) for player in self.engine.players}
+        self.all_joined = asyncio.Event()
+        self.bytes_sent = 0
+        self.snapshots_sent = 0
+
+    def on_block_changed(self, x, y):
+        self.dirty_tiles.add((x,y))
+
+    def on_bomb_dropped(self, bomb, player):
+        self.new_bombs.append(bomb_fields(bomb))
+
+    def on_explosion(self, bomb, tiles):
+        self.explosions.append(tiles)
+
+    def welcome(self, color):
+        return {
+            'type': 'welcome',
+            'color': color,
+            'tick': self.engine.tick,
+            'tick_ms': engine.TICK_MS,
+            'snapshot_every': self.snapshot_every,
+            'blocksize': self.engine.blocksize,
+            'board': self.engine.board,
+            'players': {player.color: player_fields(player) for player in self.engine.players},
+            'bombs': [bomb_fields(bomb) for bomb in self.engine.bombs],
+        }
+
+    def snapshot(self):
+        players = dict()
+        for player in self.engine.players:
+            fields = player_fields(player)
+            sent = self.sent_players[player.color]
+            changed = {k: v for k,v in fields.items() if sent[k] != v}
+            if changed:
+                players[player.color] = changed
+                sent.update(changed)
+
+        message = {'type': 'snapshot', 'tick': self.engine.tick}
+        if self.dirty_tiles:
+            message['tiles'] = [[x, y, self.engine.board[y][x]] for x,y in self.dirty_tiles]
+        if players:
+            message['players'] = players
+        if self.new_bombs:
+            message['bombs'] = self.new_bombs
+        if self.explosions:
+            message['explosions'] = self.explosions
+        self.dirty_tiles = set()
+        self.new_bombs = []
+        self.explosions = []
+        return message
+
+    def broadcast(self, message):
+        data = encode(message)
+        for writer in list(self.writers.values()):
+            if writer.is_closing():
+                continue
+            writer.write(data)
+            self.bytes_sent += len(data)
+
+    async def handle_client(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        free = [color for color in range(self.engine.n_humans) if color not in self.writers]
+        if not free or self.engine.finished:
+            writer.write(encode({'type': 'full'}))
+            writer.close()
+            return
+
+        self.handlers.add(asyncio.current_task())
+        color = free[0]
+        player = self.engine.players[color]
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.writers[color] = writer
+        writer.write(encode(self.welcome(color)))
+        if len(self.writers) == self.engine.n_humans:
+            self.all_joined.set()
+
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not is_input(message):
+                    break # a client sending anything else is dropped
+                if 'move' in message:
+                    self.engine.input_move(player, message['move'] & 0b1111)
+                if message.get('bomb'):
+                    self.engine.input_bomb(player)
+        except (ConnectionError, ValueError): # ValueError: a line longer than the reader's limit
+            pass
+        finally:
+            self.engine.input_move(player, 0)
+            del self.writers[color]
+            writer.close()
+            self.handlers.discard(asyncio.current_task())
+
+    async def run(self, host='127.0.0.1', port=PORT, max_ticks=None):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        if self.engine.n_humans:
+            await self.all_joined.wait()
+
+        loop = asyncio.get_running_loop()
+        clock = timestep.FixedTimestep(engine.TICK_MS, clock=loop.time)
+        clock.start()
+        while not self.engine.finished and (max_ticks is None or self.engine.tick < max_ticks):
+            for _ in range(clock.advance()):
+                self.engine.step()
+                if self.engine.tick % self.snapshot_every == 0 or self.engine.finished:
+                    self.broadcast(self.snapshot())
+                    self.snapshots_sent += 1
+                if self.engine.finished:
+                    break
+            await asyncio.sleep(clock.until_next_step()/1000)
+
+        winner = self.engine.winner
+        self.broadcast({'type': 'end', 'tick': self.engine.tick, 'winner': winner.color if winner else None})
+        for writer in list(self.writers.values()):
+            await writer.drain()
+            writer.close()
+        # closing a writer ends its handler's read loop, let them finish before the loop goes away
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        server.close()
+        await server.wait_closed()
+        return clock
+
+
+class Interpolation:
+    """Positions of one player by server tick, read back between the samples."""
+
+    def __init__(self, history=16):
+        self.samples = deque(maxlen=history) # (tick, x, y) with increasing ticks
+
+    def push(self, tick, x, y):
+        self.samples.append((tick, x, y))
+
+    def at(self, tick):
+        t0,x0,y0 = self.samples[0]
+        if tick <= t0:
+            return x0, y0
+        for t1,x1,y1 in itertools.islice(self.samples, 1, None):
+            if tick <= t1:
+                f = (tick - t0) / (t1 - t0)
+                return x0 + (x1-x0)*f, y0 + (y1-y0)*f
+            t0,x0,y0 = t1,x1,y1
+        return x0, y0
+
+
+class ClientState:
+    """A client's copy of the match, kept up to date from the server's messages."""
+
+    def __init__(self, welcome, clock=time.perf_counter):
+        self.clock = clock
+        self.color = welcome['color']
+        self.tick_ms = welcome['tick_ms']
+        self.blocksize = welcome['blocksize']
+        self.board = welcome['board']
+        self.players = {int(color): fields for color,fields in welcome['players'].items()}
+        self.bombs = {(x,y): (dropped_at, explodes_at) for x,y,dropped_at,explodes_at in welcome['bombs']}
+        self.interpolations = {color: Interpolation() for color in self.players}
+        self.tick = welcome['tick']
+        self.received_at = clock()
+        self.finished = False
+        self.winner = None
+        for color,fields in self.players.items():
+            self.interpolations[color].push(self.tick, fields['x'], fields['y'])
+
+    def apply(self, message):
+        if message['type'] == 'end':
+            self.finished = True
+            self.winner = message['winner']
+            return
+        if message['type'] != 'snapshot':
+            return
+
+        self.tick = message['tick']
+        self.received_at = self.clock()
+        for x,y,block in message.get('tiles', ()):
+            self.board[y][x] = block
+        for x,y,dropped_at,explodes_at in message.get('bombs', ()):
+            self.bombs[x,y] = (dropped_at, explodes_at)
+        for tiles in message.get('explosions', ()):
+            self.bombs.pop(tuple(tiles[0]), None)
+        for color,changed in message.get('players', {}).items():
+            self.players[int(color)].update(changed)
+        for color,fields in self.players.items():
+            if not fields['d']:
+                self.interpolations[color].push(self.tick, fields['x'], fields['y'])
+
+    def render_tick(self):
+        """Server tick to draw now, a little behind the newest snapshot so there is always one to move towards."""
+        return self.tick + (self.clock() - self.received_at)*1000/self.tick_ms - INTERPOLATION_DELAY
+
+    def position(self, color, tick=None):
+        return self.interpolations[color].at(self.render_tick() if tick is None else tick)
+
+
+class Client:
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.state:ClientState = None
+        self.bytes_received = 0
+
+    async def connect(self, host='127.0.0.1', port=PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        message = await self.receive()
+        if message is None or message['type'] != 'welcome':
+            raise ConnectionError('server is full')
+        self.state = ClientState(message)
+        return self.state
+
+    async def receive(self):
+        line = await self.reader.readline()
+        if not line:
+            return None
+        self.bytes_received += len(line)
+        return json.loads(line)
+
+    async def listen(self):
+        while not self.state.finished and (message := await self.receive()) is not None:
+            self.state.apply(message)
+
+    def move(self, code):
+        self.writer.write(encode({'move': code}))
+
+    def drop_bomb(self):
+        self.writer.write(encode({'bomb': True}))
+
+    def close(self):
+        self.writer.close()
+
+
+async def run_random_client(host, port, seed):
+    """Headless client that mashes random inputs, for trying the server out on localhost."""
+    rng = random.Random(seed)
+    client = Client()
+    state = await client.connect(host, port)
+    listener = asyncio.create_task(client.listen())
+    stime = time.perf_counter()
+    while not state.finished and not listener.done():
+        client.move(rng.choice((0, constants.MOVING_UP, constants.MOVING_DOWN, constants.MOVING_LEFT, constants.MOVING_RIGHT)))
+        if rng.random() < 0.1:
+            client.drop_bomb()
+        await asyncio.sleep(0.2)
+    await listener
+    elapsed = time.perf_counter() - stime
+    client.close()
+    print(f'client {state.color}: winner {state.winner} at tick {state.tick}, '
+          f'{client.bytes_received} bytes in {elapsed:.1f} s ({client.bytes_received/elapsed/1000:.1f} kB/s)')
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Authoritative network match server and a headless test client.')
+    parser.add_argument('mode', choices=('serve', 'client'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--map', default='fair.map')
+    parser.add_argument('--humans', type=int, default=2)
+    parser.add_argument('--bots', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-ticks', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        server = Server(engine.load_map('maps/' + args.map), args.humans, args.bots, args.seed)
+        stime = time.perf_counter()
+        clock = asyncio.run(server.run(args.host, args.port, args.max_ticks))
+        print(f'{server.engine.tick} ticks, {server.snapshots_sent} snapshots, {server.bytes_sent} bytes sent in '
+              f'{time.perf_counter()-stime:.1f} s; {clock.report()}')
+        filepath = f'replays/net-{args.map.rsplit(".", 1)[0]}-{time.strftime("%Y%m%d-%H%M%S")}{replay.EXTENSION}'
+        replay.save(filepath, server.engine.recorder.replay)
+        print(f'replay written to {filepath}')
+    else:
+        asyncio.run(run_random_client(args.host, args.port, args.seed))
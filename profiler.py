@@ -0,0 +1,93 @@
+import csv
+import json
+import os
+import time
+from collections import defaultdict, deque
+
+HISTOGRAM_EDGES = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32) # ms, upper bounds of all but the last bin
+
+
+class Profiler:
+    """
+    Per-section frame timings. Code being measured calls lap(name) at the end
+    of each section, which charges the time since the previous lap to name;
+    end_frame() moves the totals of the frame into a rolling window of
+    history frames per section.
+
+    Nothing holds a profiler unless profiling is switched on, callers guard
+    each lap with a plain truth test so the cost when off is that test.
+    """
+
+    def __init__(self, history=600, clock=time.perf_counter):
+        self.clock = clock
+        self.history = history
+        self.samples = defaultdict(lambda: deque(maxlen=self.history)) # section -> ms per frame
+        self.current = defaultdict(float) # section -> ms so far in this frame
+        self.last = clock()
+        self.frames = 0
+
+    def lap(self, name=None):
+        """Charge the time since the last lap to name, or just restart the lap if name is None."""
+        now = self.clock()
+        if name is not None:
+            self.current[name] += (now - self.last) * 1000
+        self.last = now
+
+    def end_frame(self):
+        for name,ms in self.current.items():
+            self.samples[name].append(ms)
+        self.current.clear()
+        self.frames += 1
+
+    def stats(self, name):
+        times = sorted(self.samples[name])
+        if not times:
+            return {'frames': 0, 'mean': 0, 'p50': 0, 'p95': 0, 'p99': 0, 'max': 0}
+        def percentile(p):
+            return times[min(len(times)-1, int(len(times)*p/100))]
+        return {
+            'frames': len(times),
+            'mean': sum(times)/len(times),
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99),
+            'max': times[-1],
+        }
+
+    def histogram(self, name, edges=HISTOGRAM_EDGES):
+        counts = [0]*(len(edges)+1)
+        for ms in self.samples[name]:
+            i = 0
+            while i < len(edges) and ms > edges[i]:
+                i += 1
+            counts[i] += 1
+        return counts
+
+    def sections(self):
+        """Section names, the most expensive at p95 first."""
+        return sorted(self.samples, key=lambda name: self.stats(name)['p95'], reverse=True)
+
+    def report(self, limit=None):
+        lines = [f'{"section":<12} {"p50":>6} {"p95":>6} {"max":>6} ms']
+        for name in self.sections()[:limit]:
+            s = self.stats(name)
+            lines.append(f'{name:<12} {s["p50"]:6.2f} {s["p95"]:6.2f} {s["max"]:6.2f}')
+        return '\n'.join(lines)
+
+    def write_csv(self, filepath):
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['section', 'frames', 'mean', 'p50', 'p95', 'p99', 'max'])
+            for name in self.sections():
+                s = self.stats(name)
+                writer.writerow([name, s['frames']] + [f'{s[k]:.4f}' for k in ('mean', 'p50', 'p95', 'p99', 'max')])
+
+    def write_json(self, filepath):
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump({
+                'frames': self.frames,
+                'histogram_edges_ms': list(HISTOGRAM_EDGES),
+                'sections': {name: dict(self.stats(name), histogram=self.histogram(name)) for name in self.sections()},
+            }, f, indent=1)
@@ -0,0 +1,217 @@
+import tkinter as tk
+
+
+def _counted(method):
+    def counted(self, *args, **kwargs):
+        self.calls += 1
+        return method(self, *args, **kwargs)
+    return counted
+
+class CountingCanvas(tk.Canvas):
+    """tk.Canvas that counts the item calls it makes to Tk."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+for _name in ('coords', 'itemconfigure', 'tag_raise', 'tag_lower', 'delete', 'move',
+              'create_image', 'create_rectangle', 'create_line', 'create_text', 'xview_moveto', 'yview_moveto'):
+    setattr(CountingCanvas, _name, _counted(getattr(tk.Canvas, _name)))
+
+
+class DepthOrder:
+    """
+    Keeps canvas items stacked by board row. Every row has a hidden anchor
+    item; the stacking order is
+
+        row 0 blocks, anchor 0, row 0 players, row 1 blocks, anchor 1, ...
+
+    so a player is drawn over its own row and under the row in front of it.
+    Items only need restacking when they change rows.
+    """
+
+    def __init__(self, canvas:tk.Canvas, n_rows):
+        self.canvas = canvas
+        self.anchors = [canvas.create_line(0, 0, 0, 0, state='hidden') for _ in range(n_rows)]
+
+    def clamp(self, row):
+        return min(max(row, 0), len(self.anchors)-1)
+
+    def place_block(self, item, row):
+        self.canvas.tag_lower(item, self.anchors[self.clamp(row)])
+
+    def place_player(self, item, row):
+        self.canvas.tag_raise(item, self.anchors[self.clamp(row)])
+
+    def destroy(self):
+        for anchor in self.anchors:
+            self.canvas.delete(anchor)
+        self.anchors = []
+
+
+class TileView:
+    """
+    Canvas items for the tiles of a board that are inside the viewport. Tiles
+    that scroll out of view hand their item over to tiles scrolling in, so
+    the number of items follows the viewport size, not the board size.
+    """
+
+    def __init__(self, canvas:tk.Canvas, depth:DepthOrder, board, blocksize, func_image):
+        self.canvas = canvas
+        self.depth = depth
+        self.board = board
+        self.blocksize = blocksize
+        self.func_image = func_image # block -> image, None for blocks that are not drawn
+        self.items = dict() # (x, y) -> item of a visible, drawn tile
+        self.free = [] # hidden items waiting to be reused
+        self.bounds = (0, 0, 0, 0) # visible tiles x0, y0, x1, y1, ends exclusive
+
+    def visible(self, x, y):
+        x0,y0,x1,y1 = self.bounds
+        return x0 <= x < x1 and y0 <= y < y1
+
+    def show(self, x0, y0, x1, y1):
+        if (x0,y0,x1,y1) == self.bounds:
+            return
+        old = self.bounds
+        self.bounds = (x0,y0,x1,y1)
+        for x,y in [tile for tile in self.items if not self.visible(*tile)]:
+            self.release(x, y)
+
+        ox0,oy0,ox1,oy1 = old
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                if not (ox0 <= x < ox1 and oy0 <= y < oy1):
+                    self.draw(x, y)
+
+    def redraw(self, x, y):
+        if not self.visible(x, y):
+            return
+        image = self.func_image(self.board[y][x])
+        if (x,y) in self.items and image is not None:
+            self.canvas.itemconfigure(self.items[x,y], image=image)
+            return
+        if (x,y) in self.items:
+            self.release(x, y)
+        self.draw(x, y)
+
+    def draw(self, x, y):
+        image = self.func_image(self.board[y][x])
+        if image is None:
+            return
+        cx, cy = x*self.blocksize + self.blocksize//2, y*self.blocksize + self.blocksize//2
+        if self.free:
+            item = self.free.pop()
+            self.canvas.coords(item, cx, cy)
+            self.canvas.itemconfigure(item, image=image, state='normal')
+        else:
+            item = self.canvas.create_image(cx, cy, image=image)
+        self.depth.place_block(item, y)
+        self.items[x,y] = item
+
+    def release(self, x, y):
+        item = self.items.pop((x,y))
+        self.canvas.itemconfigure(item, state='hidden')
+        self.free.append(item)
+
+    def destroy(self):
+        for item in list(self.items.values()) + self.free:
+            self.canvas.delete(item)
+        self.items.clear()
+        self.free.clear()
+        self.bounds = (0, 0, 0, 0)
+
+
+class Camera:
+    """
+    Scrolls a canvas over a world larger than it, keeping a followed point in
+    the middle of the view without showing anything past the world's edges.
+    Items stay at their world coordinates, only the view moves.
+    """
+
+    def __init__(self, canvas:tk.Canvas, view_width, view_height, world_width, world_height):
+        self.canvas = canvas
+        self.view_width = view_width
+        self.view_height = view_height
+        self.world_width = world_width
+        self.world_height = world_height
+        self.x = 0
+        self.y = 0
+        canvas.configure(scrollregion=(0, 0, max(world_width, view_width), max(world_height, view_height)))
+        canvas.xview_moveto(0)
+        canvas.yview_moveto(0)
+
+    def follow(self, x, y):
+        """Centres the view on (x, y), returns whether the view moved."""
+        nx = int(min(max(x - self.view_width/2, 0), max(self.world_width - self.view_width, 0)))
+        ny = int(min(max(y - self.view_height/2, 0), max(self.world_height - self.view_height, 0)))
+        if (nx,ny) == (self.x,self.y):
+            return False
+        if nx != self.x:
+            self.canvas.xview_moveto(nx / max(self.world_width, self.view_width))
+        if ny != self.y:
+            self.canvas.yview_moveto(ny / max(self.world_height, self.view_height))
+        self.x, self.y = nx, ny
+        return True
+
+    def tiles(self, blocksize, w, h):
+        """Bounds of the tiles in view, as for TileView.show()."""
+        return (self.x // blocksize, self.y // blocksize,
+                min(-(-(self.x + self.view_width) // blocksize), w), min(-(-(self.y + self.view_height) // blocksize), h))
+
+
+class FlamePool:
+    """
+    Explosion flames drawn with a pool of canvas items. Flames play in game
+    time and are all advanced by one update() call per frame instead of a
+    timer per flame; an item whose flame has burnt out is hidden and handed
+    to the next flame. A tile that catches fire again restarts its flame.
+    """
+
+    def __init__(self, canvas:tk.Canvas, depth:DepthOrder, frames, frame_length, size=0):
+        self.canvas = canvas
+        self.depth = depth
+        self.frames = frames
+        self.frame_length = frame_length # ms per frame
+        self.active = dict() # (canvas x, canvas y) -> [item, started at ms, shown frame]
+        self.free = [canvas.create_image(0, 0, image=frames[0], state='hidden') for _ in range(size)]
+
+    def spawn(self, cx, cy, row, now):
+        flame = self.active.get((cx,cy))
+        if flame:
+            flame[1] = now
+            return
+        if self.free:
+            item = self.free.pop()
+            self.canvas.coords(item, cx, cy)
+            self.canvas.itemconfigure(item, image=self.frames[0], state='normal')
+        else:
+            item = self.canvas.create_image(cx, cy, image=self.frames[0])
+        self.depth.place_block(item, row)
+        self.active[cx,cy] = [item, now, 0]
+
+    def update(self, now):
+        burnt_out = []
+        for position,flame in self.active.items():
+            frame = int(now - flame[1]) // self.frame_length
+            if frame >= len(self.frames):
+                burnt_out.append(position)
+            elif frame != flame[2]:
+                flame[2] = frame
+                self.canvas.itemconfigure(flame[0], image=self.frames[frame])
+        for position in burnt_out:
+            item = self.active.pop(position)[0]
+            self.canvas.itemconfigure(item, state='hidden')
+            self.free.append(item)
+
+    def clear(self):
+        for item,_,_ in self.active.values():
+            self.canvas.itemconfigure(item, state='hidden')
+            self.free.append(item)
+        self.active.clear()
+
+    def destroy(self):
+        for item in [flame[0] for flame in self.active.values()] + self.free:
+            self.canvas.delete(item)
+        self.active.clear()
+        self.free.clear()
@@ -0,0 +1,190 @@
+import os
+import struct
+import sys
+import time
+import zlib
+import numpy as np
+import botscheduler
+import engine
+
+EXTENSION = '.rpl'
+MAGIC = b'BRPL'
+VERSION = 3
+BOTS_RECORDED = 1 # flag: the bots' inputs are in the events, they do not decide on playback
+BOTS_SCHEDULED = 2 # flag: a bot scheduler ran the bots, each bot's replan_every follows the board
+HASH_INTERVAL = 60 # ticks between state hashes
+
+# magic, version, winner (-1 for none), width, height, humans, bots, flags, seed, blocksize,
+# pickup respawn ms (-1 for never), hash interval, events, hashes, ticks;
+# then the w*h board cells, a replan_every byte per bot if BOTS_SCHEDULED, the events and the hashes,
+# all of it zlib compressed
+HEADER = struct.Struct('<4sBbHHBBBqHiHIII')
+EVENT = struct.Struct('<IBB') # tick, player, code
+HASH = struct.Struct('<IQ') # tick, state hash
+
+
+class ReplayError(Exception):
+    pass
+
+class ReplayDivergence(ReplayError):
+    def __init__(self, tick, message):
+        super().__init__(f'tick {tick}: {message}')
+        self.tick = tick
+
+
+class Replay:
+    """
+    Everything needed to play a match again: the map, the engine settings and
+    seed, every human input by tick and the engine's state hash every
+    hash_interval ticks. Bots follow from the seed; with a bot scheduler
+    each bot's replan_every and the ticks its budget deferred a bot are
+    recorded, bots planned by a bot planner are recorded like humans instead.
+    """
+
+    def __init__(self, board, n_humans, n_bots, seed, blocksize=40, pickup_respawn_ms=None, hash_interval=HASH_INTERVAL):
+        self.board = board
+        self.n_humans = n_humans
+        self.n_bots = n_bots
+        self.seed = seed
+        self.blocksize = blocksize
+        self.pickup_respawn_ms = pickup_respawn_ms
+        self.hash_interval = hash_interval
+        self.events:list[tuple[int,int,int]] = [] # (tick, player color, engine.BOMB_INPUT, engine.SKIP_INPUT or Player.moving code)
+        self.hashes:list[tuple[int,int]] = [] # (tick, Engine.state_hash())
+        self.ticks = 0
+        self.winner = None # color of the winner
+        self.bots_recorded = False
+        self.bot_cadences = None # replan_every of each bot if a bot scheduler ran them
+
+    def to_bytes(self):
+        board = np.asarray(self.board, dtype=np.uint8)
+        h, w = board.shape
+        flags = (BOTS_RECORDED if self.bots_recorded else 0) | (BOTS_SCHEDULED if self.bot_cadences is not None else 0)
+        header = HEADER.pack(MAGIC, VERSION, -1 if self.winner is None else self.winner, w, h, self.n_humans, self.n_bots,
+                             flags, self.seed, self.blocksize, -1 if self.pickup_respawn_ms is None else self.pickup_respawn_ms,
+                             self.hash_interval, len(self.events), len(self.hashes), self.ticks)
+        events = b''.join(EVENT.pack(*event) for event in self.events)
+        hashes = b''.join(HASH.pack(*h) for h in self.hashes)
+        cadences = bytes(self.bot_cadences) if self.bot_cadences is not None else b''
+        return zlib.compress(header + board.tobytes() + cadences + events + hashes, 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        try:
+            data = zlib.decompress(data)
+            magic, version, winner, w, h, n_humans, n_bots, flags, seed, blocksize, respawn, hash_interval, n_events, n_hashes, ticks = HEADER.unpack_from(data)
+        except (zlib.error, struct.error):
+            raise ReplayError('not a replay')
+        if magic != MAGIC or version not in (2, VERSION): # version 2 is version 3 without BOTS_SCHEDULED
+            raise ReplayError(f'not a version {VERSION} replay')
+
+        offset = HEADER.size
+        board = np.frombuffer(data, dtype=np.uint8, count=w*h, offset=offset).reshape(h, w).tolist()
+        offset += w*h
+        replay = cls(board, n_humans, n_bots, seed, blocksize, None if respawn == -1 else respawn, hash_interval)
+        if flags & BOTS_SCHEDULED:
+            replay.bot_cadences = list(data[offset:offset + n_bots])
+            offset += n_bots
+        replay.events = list(EVENT.iter_unpack(data[offset:offset + n_events*EVENT.size]))
+        offset += n_events*EVENT.size
+        replay.hashes = list(HASH.iter_unpack(data[offset:offset + n_hashes*HASH.size]))
+        replay.ticks = ticks
+        replay.winner = None if winner == -1 else winner
+        replay.bots_recorded = bool(flags & BOTS_RECORDED)
+        return replay
+
+
+class Recorder:
+    """Hooks into an Engine as engine.recorder and fills a Replay as the match goes."""
+
+    def __init__(self, game:engine.Engine, board, hash_interval=HASH_INTERVAL):
+        self.replay = Replay([row[:] for row in board], game.n_humans, game.n_bots, game.seed,
+                             game.blocksize, game.pickup_respawn_ms, hash_interval)
+
+    def record_input(self, tick, color, code):
+        self.replay.events.append((tick, color, code))
+
+    def after_step(self, game:engine.Engine):
+        self.replay.ticks = game.tick
+        self.replay.bots_recorded = game.bot_planner is not None or game.record_bot_inputs
+        self.replay.bot_cadences = [bot.replan_every for bot in game.bots] if game.bot_scheduler and not self.replay.bots_recorded else None
+        if game.tick % self.replay.hash_interval == 0:
+            self.replay.hashes.append((game.tick, game.state_hash()))
+        if game.finished:
+            self.replay.winner = game.winner.color if game.winner else None
+
+
+class RecordedBots:
+    """Stands in for the bot planner on playback, the bots only get their recorded inputs."""
+
+    def run(self, game:engine.Engine):
+        pass
+
+
+def save(filepath, replay:Replay):
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    with open(filepath, 'wb') as f:
+        f.write(replay.to_bytes())
+
+def load(filepath):
+    with open(filepath, 'rb') as f:
+        return Replay.from_bytes(f.read())
+
+def play(replay:Replay, check=True):
+    """
+    Plays replay back without rendering, as fast as the engine goes, and
+    returns the engine at the end. Raises ReplayDivergence as soon as a
+    state hash or the result differs from the recording.
+    """
+    game = engine.Engine(replay.board, replay.n_humans, replay.n_bots, replay.blocksize, replay.seed, replay.pickup_respawn_ms)
+    if replay.bots_recorded:
+        game.bot_planner = RecordedBots()
+    elif replay.bot_cadences is not None:
+        for bot,cadence in zip(game.bots, replay.bot_cadences):
+            bot.replan_every = cadence
+        game.bot_scheduler = botscheduler.BotScheduler(budget_ms=float('inf')) # only the recorded deferrals
+    events = replay.events
+    hashes = dict(replay.hashes) if check else {}
+    i = 0
+    while game.tick < replay.ticks and not game.finished:
+        while i < len(events) and events[i][0] <= game.tick:
+            _, color, code = events[i]
+            if code == engine.BOMB_INPUT:
+                game.input_bomb(game.players[color])
+            elif code == engine.SKIP_INPUT:
+                game.input_skip_bot(game.players[color])
+            else:
+                game.input_move(game.players[color], code)
+            i += 1
+
+        game.step()
+        if game.tick in hashes and game.state_hash() != hashes[game.tick]:
+            raise ReplayDivergence(game.tick, 'state hash differs from the recording')
+
+    if check:
+        winner = game.winner.color if game.winner else None
+        if game.tick != replay.ticks or winner != replay.winner:
+            raise ReplayDivergence(game.tick, f'ended with winner {winner} after {game.tick} ticks, '
+                                              f'recorded {replay.winner} after {replay.ticks}')
+    return game
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Play replays back headless and check that they still play out the same.')
+    parser.add_argument('replays', nargs='+')
+    parser.add_argument('--no-check', action='store_true', help='only time the playback')
+    args = parser.parse_args()
+
+    failed = 0
+    for filepath in args.replays:
+        replay = load(filepath)
+        stime = time.perf_counter()
+        try:
+            game = play(replay, not args.no_check)
+        except ReplayDivergence as e:
+            failed += 1
+            print(f'{filepath}: DIVERGED at {e}')
+            continue
+        elapsed = time.perf_counter() - stime
+        print(f'{filepath}: {game.tick} ticks in {elapsed:.2f} s ({game.tick/elapsed:.0f} ticks/s), ok')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,52 @@
+import heapq
+import itertools
+
+
+class Event:
+    __slots__ = ('due', 'func', 'args', 'cancelled')
+
+    def __init__(self, due, func, args):
+        self.due = due
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+
+class EventScheduler:
+    """
+    Game-time timers on a heap of (due tick, sequence, event). Events due on
+    the same tick run in the order they were scheduled. Time only moves when
+    run_due() is called with a later tick, so a paused game freezes them all.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def schedule(self, due, func, *args):
+        event = Event(due, func, args)
+        heapq.heappush(self.heap, (due, next(self.counter), event))
+        return event
+
+    def cancel(self, event:Event):
+        event.cancelled = True
+
+    def reschedule(self, event:Event, due):
+        self.cancel(event)
+        return self.schedule(due, event.func, *event.args)
+
+    def run_due(self, now):
+        """Run every event due at or before now, including ones scheduled while running."""
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            _, _, event = heapq.heappop(heap)
+            if not event.cancelled:
+                event.func(*event.args)
+
+    def next_due(self):
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def __len__(self):
+        return sum(1 for _, _, event in self.heap if not event.cancelled)
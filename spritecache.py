@@ -0,0 +1,78 @@
+import os
+from collections import OrderedDict
+from PIL import Image
+import numpy as np
+
+CACHE_DIR = '.cache/sprites'
+CACHE_VERSION = 1 # bump when the way cached frames are produced changes
+
+
+def _source_stamp(sources):
+    stamp = [CACHE_VERSION]
+    for source in sources:
+        st = os.stat(source)
+        stamp += [st.st_mtime_ns, st.st_size]
+    return np.array(stamp, dtype=np.int64)
+
+def _filename(key):
+    return '_'.join(str(part).replace('/', '-').replace('\\', '-') for part in key) + '.npz'
+
+
+class SpriteCache:
+    """
+    Two-level cache of processed sprite frames.
+
+    frames() keeps rows of PIL images on disk as .npz, valid while the source
+    files keep their mtime and size. get() adds an in-memory LRU on top that
+    holds whatever convert() makes of those frames (usually PhotoImages).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, maxsize=64):
+        self.cache_dir = cache_dir
+        self.maxsize = maxsize
+        self.memory = OrderedDict()
+
+    def load(self, key, sources):
+        try:
+            with np.load(os.path.join(self.cache_dir, _filename(key))) as data:
+                if not np.array_equal(data['stamp'], _source_stamp(sources)):
+                    return None
+                layout = data['layout']
+                return [[Image.fromarray(data[f'frame_{i}_{j}'], 'RGBA') for j in range(n)] for i,n in enumerate(layout)]
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, key, sources, frames):
+        arrays = {f'frame_{i}_{j}': np.asarray(image.convert('RGBA')) for i,row in enumerate(frames) for j,image in enumerate(row)}
+        arrays['layout'] = np.array([len(row) for row in frames], dtype=np.int64)
+        arrays['stamp'] = _source_stamp(sources)
+
+        path = os.path.join(self.cache_dir, _filename(key))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            pass # the cache is an optimisation, a read-only checkout still works
+
+    def frames(self, key, sources, build):
+        frames = self.load(key, sources)
+        if frames is None:
+            frames = build()
+            self.save(key, sources, frames)
+        return frames
+
+    def get(self, key, sources, build, convert=lambda frames: frames):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        value = convert(self.frames(key, sources, build))
+        self.memory[key] = value
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.memory.clear()
@@ -1,83 +1,89 @@
+from functools import cached_property
+import os
 from PIL import Image
 import numpy as np
 
-def split_vertically(data, alpha_threshold=0, min_length=0):
+def bands(occupied, min_length=0):
+    """
+    (start, end) index pairs, end inclusive, of the occupied runs in a 1D mask.
+    A band is only closed by an empty index at least min_length past its start,
+    until then the following runs are merged into it.
+    """
+    edges = np.diff(np.concatenate(([0], occupied.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+
+    splits = []
     start = -1
     end = -1
-    splits = []
-    for x in range(data.shape[1]):
-        if np.all(data[:,x,3] <= alpha_threshold):
-            if x-start >= min_length and start != -1:
-                splits.append(data[:,start:end+1,:])
-                start = -1
-                end = -1
-        else:
-            if start == -1:
-                start = x
-            end = x
+    gap_ends = (starts[1:] - 1).tolist() + [len(occupied) - 1]
+    for s,e,gap_end in zip(starts.tolist(), ends.tolist(), gap_ends):
+        if start == -1:
+            start = s
+        end = e
+        # the run is closed by any empty index of the following gap far enough from start
+        if e < gap_end and gap_end-start >= min_length:
+            splits.append((start, end))
+            start = -1
+            end = -1
 
     if start < end and end-start >= min_length:
-        splits.append(data[:,start:end+1,:])
-    
+        splits.append((start, end))
+
     return splits
 
+def split_vertically(data, alpha_threshold=0, min_length=0):
+    occupied = (data[:,:,3] > alpha_threshold).any(axis=0)
+    return [data[:,start:end+1,:] for start,end in bands(occupied, min_length)]
+
 def split_horizontally(data, alpha_threshold=0, min_length=0):
-    splits = []
-    start = -1
-    end = -1
-    for y in range(data.shape[0]):
-        if np.all(data[y,:,3] <= alpha_threshold):
-            if y-start >= min_length and start != -1:
-                # print(start,end)
-                splits.append(data[start:end+1,:,:])
-                start = -1
-                end = -1
-        else:
-            if start == -1:
-                start = y
-            end = y
+    occupied = (data[:,:,3] > alpha_threshold).any(axis=1)
+    return [data[start:end+1,:,:] for start,end in bands(occupied, min_length)]
 
-    if start < end and end-start >= min_length:
-        splits.append(data[start:end+1,:,:])
-    
+def split_arrays(data, alpha_threshold=0, min_length=0):
+    """Rows of frames as views into data, nothing is copied."""
+    opaque = data[:,:,3] > alpha_threshold
+    splits = []
+    for top,bottom in bands(opaque.any(axis=1), min_length):
+        row = data[top:bottom+1]
+        splits.append([row[:,left:right+1] for left,right in bands(opaque[top:bottom+1].any(axis=0), min_length)])
     return splits
 
 
-def split(filepath, alpha_threshold=0, min_length=0):
-    image = Image.open(filepath).convert('RGBA')
-    # print(image.mode)
-    data = np.array(image)
-    # print(data.shape)
+class SpriteSheet:
+    """A sheet that is only decoded and split the first time it is used."""
 
-    horizontal = split_horizontally(data, alpha_threshold, min_length)
+    def __init__(self, filepath, alpha_threshold=0, min_length=0):
+        self.filepath = filepath
+        self.alpha_threshold = alpha_threshold
+        self.min_length = min_length
 
-    # for x in horizontal:
-        # Image.fromarray(x).show()
-        # print(x)
-        # pass
-    # print(horizontal[-1], np.nonzero(horizontal[-1]), horizontal[-1][0,256])
-    # return
+    @cached_property
+    def data(self):
+        with Image.open(self.filepath) as image:
+            return np.array(image.convert('RGBA'))
 
-    splits = []
-    for x in horizontal:
-        splits.append(split_vertically(x, alpha_threshold, min_length))
+    @cached_property
+    def arrays(self):
+        return split_arrays(self.data, self.alpha_threshold, self.min_length)
 
-    # print(len(splits))
-    for i in range(len(splits)):
-        for j in range(len(splits[i])):
-            splits[i][j] = Image.fromarray(splits[i][j])
-    
-    return splits
+    @cached_property
+    def images(self):
+        return [[Image.fromarray(frame) for frame in row] for row in self.arrays]
+
+
+def split(filepath, alpha_threshold=0, min_length=0):
+    return SpriteSheet(filepath, alpha_threshold, min_length).images
 
 def split_and_save(filepath, alpha_threshold=0, min_length=0):
     splits = split(filepath, alpha_threshold, min_length)
-    
+    name = os.path.splitext(os.path.basename(filepath))[0]
+
     for i in range(len(splits)):
         for j in range(len(splits[i])):
-            splits[i][j].save(f'computed/{filepath.split('/')[-1].split('.')[0]}_{i}_{j}.png')    
-            
+            splits[i][j].save(f'computed/{name}_{i}_{j}.png')
+
 if __name__ == '__main__':
-    import os
     for x in os.listdir('./computed'):
         os.remove(f'./computed/{x}')
     split_and_save('assets/death.png', 0, 40)
@@ -0,0 +1,58 @@
+import time
+from collections import deque
+
+
+class FixedTimestep:
+    """
+    Turns irregular frame callbacks into a whole number of fixed simulation
+    steps. Real time is collected in an accumulator and paid out step_ms at a
+    time; when a frame comes so late that more than max_steps_per_frame steps
+    are owed, the rest is dropped instead of spiralling further behind.
+    """
+
+    def __init__(self, step_ms, max_steps_per_frame=5, history=600, clock=time.perf_counter):
+        self.step_ms = step_ms
+        self.max_steps_per_frame = max_steps_per_frame
+        self.clock = clock
+        self.frame_times = deque(maxlen=history) # ms between consecutive frames
+        self.accumulator = 0
+        self.last = None
+        self.steps = 0
+        self.dropped_steps = 0
+
+    def start(self):
+        self.last = self.clock()
+        self.accumulator = 0
+
+    def advance(self):
+        """Number of simulation steps the current frame should run."""
+        now = self.clock()
+        if self.last is None:
+            self.last = now
+        elapsed = (now - self.last) * 1000
+        self.last = now
+        self.frame_times.append(elapsed)
+
+        self.accumulator += elapsed
+        steps = int(self.accumulator // self.step_ms)
+        self.accumulator -= steps * self.step_ms
+        if steps > self.max_steps_per_frame:
+            self.dropped_steps += steps - self.max_steps_per_frame
+            steps = self.max_steps_per_frame
+
+        self.steps += steps
+        return steps
+
+    def until_next_step(self):
+        """ms until the next step is due."""
+        return max(self.step_ms - self.accumulator, 0)
+
+    def percentiles(self, ps=(50, 95, 99)):
+        times = sorted(self.frame_times)
+        if not times:
+            return {p: 0 for p in ps}
+        return {p: times[min(len(times)-1, int(len(times)*p/100))] for p in ps}
+
+    def report(self):
+        percentiles = ', '.join(f'p{p} {t:.1f} ms' for p,t in self.percentiles().items())
+        return f'frame time {percentiles}; {self.steps} steps, {self.dropped_steps} dropped'
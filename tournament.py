@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import constants
+import engine
+import replay
+
+MAX_BOTS = 8
+
+
+def count_spawnpoints(board):
+    return sum(row.count(constants.SPAWNPOINT) for row in board)
+
+def play_match(maps_dir, map_name, n_bots, seed, max_ticks, replays_dir=None):
+    board = engine.load_map(os.path.join(maps_dir, map_name))
+    game = engine.Engine(board, 0, n_bots, seed=seed)
+    if replays_dir:
+        game.recorder = replay.Recorder(game, board)
+    stime = time.perf_counter()
+    game.run(max_ticks)
+    elapsed = time.perf_counter() - stime
+    if replays_dir:
+        replay.save(os.path.join(replays_dir, f'{os.path.splitext(map_name)[0]}-{seed}{replay.EXTENSION}'), game.recorder.replay)
+
+    winner = game.winner
+    return {
+        'map': map_name,
+        'seed': seed,
+        'finished': game.finished,
+        'winner_color': winner.color if winner else None,
+        'winner_spawn': game.spawnpoints[game.players.index(winner)] if winner else None,
+        'ticks': game.tick,
+        'bombs_dropped': game.bombs_dropped,
+        'elapsed': elapsed,
+    }
+
+def summarize(results):
+    n = len(results)
+    wins = [r for r in results if r['winner_color'] is not None]
+    ticks = sum(r['ticks'] for r in results)
+    elapsed = sum(r['elapsed'] for r in results)
+    by_color = Counter(constants.COLOR_NAMES[r['winner_color']] if r['winner_color'] < len(constants.COLOR_NAMES) else str(r['winner_color']) for r in wins)
+    by_spawn = Counter('{},{}'.format(*r['winner_spawn']) for r in wins)
+    return {
+        'matches': n,
+        'ties': sum(1 for r in results if r['finished'] and r['winner_color'] is None),
+        'timeouts': sum(1 for r in results if not r['finished']),
+        'mean_ticks': ticks / n,
+        'mean_seconds': ticks / n * engine.TICK_MS / 1000,
+        'mean_bombs_dropped': sum(r['bombs_dropped'] for r in results) / n,
+        'ticks_per_second': ticks / elapsed if elapsed else 0,
+        'win_rate_by_color': {k: v / n for k,v in sorted(by_color.items())},
+        'win_rate_by_spawn': {k: v / n for k,v in sorted(by_spawn.items())},
+    }
+
+def run_tournament(maps_dir, map_names, n_matches, n_bots=None, max_ticks=20000, seed=0, workers=None, replays_dir=None):
+    jobs = []
+    for map_name in map_names:
+        spawnpoints = count_spawnpoints(engine.load_map(os.path.join(maps_dir, map_name)))
+        bots = min(spawnpoints, n_bots or MAX_BOTS)
+        if bots < 2:
+            continue
+        for i in range(n_matches):
+            jobs.append((maps_dir, map_name, bots, seed+i, max_ticks, replays_dir))
+
+    if not jobs:
+        return {}
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(play_match, *zip(*jobs), chunksize=max(1, len(jobs)//(4*workers))))
+
+    by_map = {}
+    for r in results:
+        by_map.setdefault(r['map'], []).append(r)
+    return {map_name: summarize(rs) for map_name,rs in by_map.items()}
+
+def print_report(report):
+    for map_name, s in report.items():
+        print(f"{map_name}: {s['matches']} matches, {s['ties']} ties, {s['timeouts']} timeouts, "
+              f"{s['mean_seconds']:.1f} s ({s['mean_ticks']:.0f} ticks) per match, "
+              f"{s['mean_bombs_dropped']:.1f} bombs, {s['ticks_per_second']:.0f} ticks/s")
+        print('    by color: ' + ', '.join(f'{k} {v:.0%}' for k,v in s['win_rate_by_color'].items()))
+        print('    by spawn: ' + ', '.join(f'({k}) {v:.0%}' for k,v in s['win_rate_by_spawn'].items()))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play bot-only matches on every map and report balance statistics.')
+    parser.add_argument('-n', '--matches', type=int, default=20, help='matches per map')
+    parser.add_argument('-b', '--bots', type=int, default=None, help=f'bots per match (default: every spawnpoint, at most {MAX_BOTS})')
+    parser.add_argument('-t', '--max-ticks', type=int, default=20000, help='ticks before a match is called a timeout')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='seed of the first match, later matches count up from it')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--maps-dir', default='maps')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--replays', help='record every match into this directory')
+    parser.add_argument('maps', nargs='*', help='map files to play (default: all of --maps-dir)')
+    args = parser.parse_args()
+
+    map_names = args.maps or sorted(os.listdir(args.maps_dir))
+    stime = time.perf_counter()
+    report = run_tournament(args.maps_dir, map_names, args.matches, args.bots, args.max_ticks, args.seed, args.workers, args.replays)
+    print_report(report)
+    print(f'done in {time.perf_counter()-stime:.1f} s')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)